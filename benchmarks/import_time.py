@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Import time benchmark of the oopgrade entry points.
+
+Every target is imported in a fresh interpreter several times and the best
+and median wall times are reported, together with the heavy dependencies it
+loaded.
+
+Usage::
+
+    python benchmarks/import_time.py [--runs 10]
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import json
+import subprocess
+import sys
+
+TARGETS = [
+    'oopgrade',
+    'oopgrade.cli',
+    'oopgrade.pubsub',
+    'oopgrade.oopgrade',
+    'oopgrade.data',
+]
+
+HEAVY_MODULES = [
+    'lxml', 'ooquery', 'sql', 'psycopg2', 'tqdm', 'redis', 'itsdangerous',
+    'pkg_resources', 'semver',
+]
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+import {target}
+elapsed = time.time() - start
+print(json.dumps({{
+    'elapsed': elapsed,
+    'heavy': sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+def measure(target, runs):
+    times = []
+    heavy = []
+    for _ in range(runs):
+        output = subprocess.check_output([
+            sys.executable, '-c', SCRIPT.format(target=target, heavy=HEAVY_MODULES)
+        ])
+        res = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        times.append(res['elapsed'])
+        heavy = res['heavy']
+    times.sort()
+    return {
+        'target': target,
+        'best': times[0],
+        'median': times[len(times) // 2],
+        'heavy': heavy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    args = parser.parse_args()
+    results = [measure(target, args.runs) for target in TARGETS]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print('{:<20} {:>10} {:>10}  {}'.format('target', 'best ms', 'median ms', 'heavy imports'))
+    for res in results:
+        print('{:<20} {:>10.1f} {:>10.1f}  {}'.format(
+            res['target'], res['best'] * 1000, res['median'] * 1000,
+            ', '.join(res['heavy']) or '-'
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# coding=utf-8
+"""Publish throughput benchmark of oopgrade.pubsub.
+
+Signed messages are published to a Redis server with every publishing mode:
+
+- sign: only signing the messages, to know its share of the cost
+- per_call: `send_msg`, a new signer and connection per message
+- pooled: `Publisher.publish`, one round trip per message
+- pipelined: `Publisher.publish_many`, one round trip per batch
+
+Messages/s and latency percentiles are reported for every mode. The
+latency of a pipelined message is the latency of its batch.
+
+Without --redis-url an in-process fake server answering the Redis protocol
+on a local TCP port is used, so the numbers include the network round trips
+but not the Redis fan-out to subscribers.
+
+Usage::
+
+    python benchmarks/pubsub_throughput.py [--messages 2000] [--size 256]
+        [--batch-size 100] [--redis-url redis://localhost:6379/0]
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from oopgrade.pubsub import Publisher, build_msg, send_msg  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+MODES = ['sign', 'per_call', 'pooled', 'pipelined']
+SECRET = 'benchmark-secret'
+CHANNEL = 'benchmark.pubsub'
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    """Answer the Redis protocol: PUBLISH gets 0 subscribers, HELLO gets
+    the requested protocol version and any other command (connection
+    handshake) gets OK.
+    """
+
+    def setup(self):
+        # Like redis-server, do not delay the small replies
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        socketserver.StreamRequestHandler.setup(self)
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if args and args[0].upper() == b'PUBLISH':
+                self.wfile.write(b':0\r\n')
+            elif args and args[0].upper() == b'HELLO':
+                proto = int(args[1]) if len(args) > 1 else 2
+                self.wfile.write(
+                    (b'%2' if proto == 3 else b'*4') +
+                    b'\r\n$6\r\nserver\r\n$5\r\nredis\r\n$5\r\nproto\r\n:' +
+                    str(proto).encode('ascii') + b'\r\n'
+                )
+            else:
+                self.wfile.write(b'+OK\r\n')
+            self.wfile.flush()
+
+
+class FakeRedisServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        socketserver.TCPServer.__init__(self, ('127.0.0.1', 0), _RESPHandler)
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'redis://{}:{}/0'.format(*self.server_address)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def make_messages(count, size):
+    padding = 'x' * max(0, size - len(build_msg('reload', {'data': ''})))
+    return [
+        (CHANNEL, build_msg('reload', {'data': padding, 'n': i}))
+        for i in range(count)
+    ]
+
+
+def run_mode(mode, redis_url, messages, batch_size):
+    latencies = []
+    start = timer()
+    if mode == 'sign':
+        from itsdangerous import Signer
+        signer = Signer(SECRET)
+        for channel, msg in messages:
+            t0 = timer()
+            signer.sign(msg)
+            latencies.append(timer() - t0)
+    elif mode == 'per_call':
+        for channel, msg in messages:
+            t0 = timer()
+            send_msg(redis_url, SECRET, channel, msg)
+            latencies.append(timer() - t0)
+    elif mode == 'pooled':
+        with Publisher(redis_url, SECRET) as publisher:
+            for channel, msg in messages:
+                t0 = timer()
+                publisher.publish(channel, msg)
+                latencies.append(timer() - t0)
+    elif mode == 'pipelined':
+        with Publisher(redis_url, SECRET) as publisher:
+            for i in range(0, len(messages), batch_size):
+                batch = messages[i:i + batch_size]
+                t0 = timer()
+                publisher.publish_many(batch, batch_size=batch_size)
+                latencies.extend([timer() - t0] * len(batch))
+    else:
+        raise ValueError('Unknown mode {}'.format(mode))
+    elapsed = timer() - start
+    return {
+        'mode': mode,
+        'messages': len(messages),
+        'elapsed': elapsed,
+        'msgs_per_s': len(messages) / elapsed if elapsed else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run(redis_url, count, size, batch_size, modes):
+    messages = make_messages(count, size)
+    return [run_mode(mode, redis_url, messages, batch_size) for mode in modes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=256, help='Message size in bytes')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--redis-url', default=None, help='Redis server (default: in-process fake)')
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma separated modes')
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    if args.redis_url:
+        results = run(args.redis_url, args.messages, args.size, args.batch_size, modes)
+    else:
+        with FakeRedisServer() as server:
+            results = run(server.url, args.messages, args.size, args.batch_size, modes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print('{:<10} {:>10} {:>12} {:>9} {:>9} {:>9}'.format(
+        'mode', 'messages', 'msgs/s', 'p50 ms', 'p95 ms', 'p99 ms'
+    ))
+    for res in results:
+        print('{:<10} {:>10} {:>12.0f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+            res['mode'], res['messages'], res['msgs_per_s'],
+            res['p50_ms'], res['p95_ms'], res['p99_ms']
+        ))
+
+
+if __name__ == '__main__':
+    main()
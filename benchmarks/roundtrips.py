@@ -0,0 +1,484 @@
+# coding=utf-8
+"""Round-trip benchmark suite of the oopgrade helpers.
+
+Every helper runs against synthetic inputs of growing size through a
+:class:`RecordingCursor`, which counts the round trips to the database and
+the bytes sent (query text plus parameters). By default the cursor answers
+with canned rows, so no database is needed.
+
+With --dsn the helpers that only use SQL also run on a disposable database
+created (and dropped) on that server, and the wall time is reported too.
+
+The counts are compared with the saved baselines so regressions fail::
+
+    python benchmarks/roundtrips.py --check       # exit 1 on regressions
+    python benchmarks/roundtrips.py --update      # save new baselines
+    python benchmarks/roundtrips.py --sizes 10,1000 --dsn "user=erp host=localhost"
+
+The baselines are also checked by `spec/roundtrips_spec.py`.
+"""
+from __future__ import absolute_import, print_function
+import argparse
+import json
+import os
+import sys
+import time
+
+if sys.version_info[0] == 2:
+    from mock import Mock, patch
+else:
+    from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# set_stored_function progress bars
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+from oopgrade import oopgrade as helpers  # noqa: E402
+from oopgrade.data import DataMigration  # noqa: E402
+from oopgrade.log import XmlIdRecorder, log_xml_id  # noqa: E402
+
+timer = getattr(time, 'perf_counter', time.time)
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'baselines', 'roundtrips.json'
+)
+DEFAULT_SIZES = [1, 10, 100]
+
+
+class RecordingCursor(object):
+    """Cursor counting the round trips and bytes sent to the database.
+
+    :param cursor: Database cursor to delegate to, or None to answer with \
+    the rows returned by `responder`.
+    :param responder: Function called with (query, args) returning the \
+    rows of the query when there is no cursor.
+    """
+
+    def __init__(self, cursor=None, responder=None):
+        self.cursor = cursor
+        self.responder = responder or (lambda query, args: [])
+        self.dbname = 'benchmark'
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self._rows = []
+        self._rowcount = -1
+
+    def _send(self, query, args=None):
+        self.round_trips += 1
+        self.bytes_sent += len(query)
+        if args is not None:
+            self.bytes_sent += len(repr(args))
+
+    def execute(self, query, args=None):
+        self._send(query, args)
+        if self.cursor is not None:
+            return self.cursor.execute(query, args)
+        self._rows = list(self.responder(query, args) or [])
+        self._rowcount = len(self._rows)
+
+    def executemany(self, query, args_list):
+        for args in args_list:
+            self.execute(query, args)
+
+    def copy_from(self, file, table, sep='\t', null='\\N', size=8192, columns=None):
+        chunks = []
+        while True:
+            chunk = file.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = ''.join(chunks)
+        self.round_trips += 1
+        self.bytes_sent += len(data)
+        if self.cursor is not None:
+            import io
+            self.cursor.copy_from(
+                io.StringIO(data), table, sep=sep, null=null, columns=columns
+            )
+        self._rowcount = data.count('\n')
+
+    @property
+    def rowcount(self):
+        if self.cursor is not None:
+            return self.cursor.rowcount
+        return self._rowcount
+
+    def fetchone(self):
+        if self.cursor is not None:
+            return self.cursor.fetchone()
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        if self.cursor is not None:
+            return self.cursor.fetchall()
+        rows, self._rows = self._rows, []
+        return rows
+
+    def dictfetchall(self):
+        return self.fetchall()
+
+
+def _count_rows(query, args, size):
+    if query.lstrip().upper().startswith('SELECT COUNT('):
+        return [(0, )]
+    return []
+
+
+def _fake_pooler():
+    pool = Mock()
+    pool.get.return_value.search.return_value = [1]
+    pooler = Mock()
+    pooler.get_pool.return_value = pool
+    return pooler
+
+
+TRANSLATION_SCHEMA = [
+    "CREATE TABLE ir_translation (id serial PRIMARY KEY, lang varchar,"
+    " name varchar, type varchar, res_id integer, src text, value text,"
+    " src_md5 varchar(32) GENERATED ALWAYS AS (md5(coalesce(src, ''))) STORED)",
+    "CREATE UNIQUE INDEX ir_translation_res_id ON ir_translation"
+    " (lang, src_md5, name, type, res_id) WHERE res_id IS NOT NULL",
+    "CREATE UNIQUE INDEX ir_translation_no_res_id ON ir_translation"
+    " (lang, src_md5, name, type) WHERE res_id IS NULL",
+]
+
+MODEL_DATA_SCHEMA = [
+    "CREATE TABLE ir_model_data (id serial PRIMARY KEY, name varchar,"
+    " model varchar, noupdate boolean, res_id integer, module varchar)",
+    "CREATE INDEX ir_model_data_module_name ON ir_model_data (module, name)",
+]
+
+RECORD_SCHEMA = MODEL_DATA_SCHEMA + [
+    "CREATE TABLE openupgrade_record (id serial PRIMARY KEY, module varchar,"
+    " model varchar, name varchar, type varchar)",
+]
+
+
+def _record_schema(size):
+    return RECORD_SCHEMA + [
+        "INSERT INTO ir_model_data (name, model, module, res_id) "
+        "SELECT 'record_' || i, 'bench.model', 'bench', i "
+        "FROM generate_series(0, {}) i".format(size - 1),
+    ]
+
+
+def _record_responder(query, args, size):
+    if query.startswith('SELECT count(relname)'):
+        return [(1, )]
+    if query.startswith('SELECT model FROM ir_model_data'):
+        return [('bench.model', )]
+    if query.startswith('SELECT name, model FROM ir_model_data'):
+        return [(name, 'bench.model') for name in args[1]]
+    return []
+
+
+def case_add_columns(cursor, size):
+    helpers.add_columns(cursor, {
+        'bench_table': [('col_{}'.format(i), 'integer') for i in range(size)]
+    })
+
+
+case_add_columns.responder = _count_rows
+case_add_columns.schema = lambda size: [
+    "CREATE TABLE bench_table (id serial PRIMARY KEY)"
+]
+
+
+def case_load_translation(cursor, size):
+    for i in range(size):
+        helpers.load_translation(
+            cursor, 'es_ES', 'bench.model,name', 'model', i,
+            'Source {}'.format(i), 'Origen {}'.format(i)
+        )
+
+
+case_load_translation.schema = lambda size: TRANSLATION_SCHEMA
+
+
+def case_load_translations_bulk(cursor, size):
+    # The recording cursor stands in for the psycopg2 cursor, so the
+    # translations are sent with COPY as in a real migration
+    with patch('oopgrade.cursor._psycopg2_cursor_class',
+               return_value=RecordingCursor):
+        helpers.load_translations_bulk(cursor, [
+            ('es_ES', 'bench.model,name', 'model', i, 'Source {}'.format(i),
+             'Origen {}'.format(i))
+            for i in range(size)
+        ])
+
+
+case_load_translations_bulk.responder = _count_rows
+case_load_translations_bulk.schema = lambda size: (
+    TRANSLATION_SCHEMA + MODEL_DATA_SCHEMA
+)
+
+
+def case_log_xml_id(cursor, size):
+    for i in range(size):
+        log_xml_id(cursor, 'bench', 'record_{}'.format(i))
+
+
+case_log_xml_id.responder = _record_responder
+case_log_xml_id.schema = _record_schema
+
+
+def case_xml_id_recorder(cursor, size):
+    with XmlIdRecorder(cursor, 'bench') as recorder:
+        for i in range(size):
+            recorder.record('record_{}'.format(i))
+
+
+case_xml_id_recorder.responder = _record_responder
+case_xml_id_recorder.schema = _record_schema
+
+
+def case_data_migration(cursor, size):
+    records = ''.join(
+        '<record model="bench.model" id="record_{0}">'
+        '<field name="name">Record {0}</field></record>'.format(i)
+        for i in range(size)
+    )
+    content = '<openerp><data>{}</data></openerp>'.format(records)
+    DataMigration(content, cursor, 'bench').migrate()
+
+
+case_data_migration.responder = lambda query, args, size: (
+    [(1, )] if 'RETURNING' in query else []
+)
+case_data_migration.schema = lambda size: MODEL_DATA_SCHEMA + [
+    "CREATE TABLE bench_model (id serial PRIMARY KEY, name varchar)",
+]
+
+
+def _stored_function_model():
+    field = Mock()
+    field._multi = False
+    field._symbol_set = ('%s', int)
+    field.get.side_effect = lambda cr, obj, ids, name, uid, context: dict(
+        (x, x * 2) for x in ids
+    )
+    obj = Mock()
+    obj._table = 'bench_model'
+    obj._columns = {'total': field}
+    return obj
+
+
+def case_set_stored_function(cursor, size):
+    helpers.set_stored_function(cursor, _stored_function_model(), ['total'])
+
+
+case_set_stored_function.responder = lambda query, args, size: (
+    [(i, ) for i in range(1, size + 1)]
+    if query.startswith('select id from') else []
+)
+case_set_stored_function.schema = lambda size: [
+    "CREATE TABLE bench_model (id serial PRIMARY KEY, total integer)",
+    "INSERT INTO bench_model (total) SELECT 0 FROM generate_series(1, {})".format(size),
+]
+
+
+def case_remove_model(cursor, size):
+    with patch.dict(sys.modules, {'pooler': _fake_pooler()}):
+        helpers.remove_model(
+            cursor, ['bench.model{}'.format(i) for i in range(size)]
+        )
+
+
+case_remove_model.responder = lambda query, args, size: (
+    [(1, )] if query.lower().startswith('select') else []
+)
+
+
+def case_delete_record(cursor, size):
+    with patch.dict(sys.modules, {'pooler': _fake_pooler()}):
+        helpers.delete_record(
+            cursor, 'bench', ['record_{}'.format(i) for i in range(size)]
+        )
+
+
+case_delete_record.responder = lambda query, args, size: (
+    [{'id': 1, 'model': 'ir.ui.view', 'res_id': 2}]
+    if 'FROM ir_model_data' in query else []
+)
+
+
+CASES = [
+    ('add_columns', case_add_columns),
+    ('load_translation', case_load_translation),
+    ('load_translations_bulk', case_load_translations_bulk),
+    ('log_xml_id', case_log_xml_id),
+    ('xml_id_recorder', case_xml_id_recorder),
+    ('data_migration', case_data_migration),
+    ('set_stored_function', case_set_stored_function),
+    ('remove_model', case_remove_model),
+    ('delete_record', case_delete_record),
+]
+
+
+def run_case(case, size, conn=None):
+    """Run a case with a recording cursor, on `conn` if given.
+
+    Cases are functions called with (cursor, size). Without connection the
+    cursor answers with the rows returned by their optional
+    `responder(query, args, size)` attribute. Only the cases with a
+    `schema(size)` attribute, returning the queries creating the tables they
+    need, run on a database.
+
+    :return: dict with the keys round_trips, bytes_sent and elapsed, or None \
+    if the case can not run on a database.
+    """
+    if conn is None:
+        responder = getattr(case, 'responder', None)
+        cursor = RecordingCursor(responder=responder and (
+            lambda query, args: responder(query, args, size)
+        ))
+        start = timer()
+        case(cursor, size)
+        elapsed = timer() - start
+    else:
+        schema = getattr(case, 'schema', None)
+        if schema is None:
+            return None
+        with conn.cursor() as db_cursor:
+            try:
+                for query in schema(size):
+                    db_cursor.execute(query)
+                cursor = RecordingCursor(db_cursor)
+                start = timer()
+                case(cursor, size)
+                elapsed = timer() - start
+            finally:
+                conn.rollback()
+    return {
+        'round_trips': cursor.round_trips,
+        'bytes_sent': cursor.bytes_sent,
+        'elapsed': elapsed,
+    }
+
+
+def run(sizes, names=None, conn=None):
+    """Run the cases.
+
+    :return: {case name: {size: result}}, sizes as strings like in JSON
+    """
+    results = {}
+    for name, case in CASES:
+        if names and name not in names:
+            continue
+        for size in sizes:
+            res = run_case(case, size, conn)
+            if res is not None:
+                results.setdefault(name, {})[str(size)] = res
+    return results
+
+
+def check(results, baseline, bytes_tolerance=None):
+    """Compare results with a baseline.
+
+    :param bytes_tolerance: Allowed relative increase of the bytes sent, \
+    None to not check them.
+    :return: list of regression messages
+    """
+    errors = []
+    for name, sizes in sorted(results.items()):
+        for size, res in sorted(sizes.items(), key=lambda x: int(x[0])):
+            base = baseline.get(name, {}).get(size)
+            if base is None:
+                continue
+            if res['round_trips'] > base['round_trips']:
+                errors.append('{} ({}): {} round trips, baseline {}'.format(
+                    name, size, res['round_trips'], base['round_trips']
+                ))
+            if (bytes_tolerance is not None and
+                    res['bytes_sent'] > base['bytes_sent'] * (1 + bytes_tolerance)):
+                errors.append('{} ({}): {} bytes sent, baseline {}'.format(
+                    name, size, res['bytes_sent'], base['bytes_sent']
+                ))
+    return errors
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, 'r') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = dict(
+        (name, dict(
+            (size, {'round_trips': res['round_trips'], 'bytes_sent': res['bytes_sent']})
+            for size, res in sizes.items()
+        ))
+        for name, sizes in results.items()
+    )
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def _disposable_database(dsn):
+    import psycopg2
+    dbname = 'oopgrade_bench_{}'.format(os.getpid())
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute('CREATE DATABASE "{}"'.format(dbname))
+    conn = psycopg2.connect(dsn, dbname=dbname)
+
+    def drop():
+        conn.close()
+        with admin.cursor() as cursor:
+            cursor.execute('DROP DATABASE IF EXISTS "{}"'.format(dbname))
+        admin.close()
+    return conn, drop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+        help='Comma separated input sizes'
+    )
+    parser.add_argument('--case', action='append', help='Only run this case')
+    parser.add_argument('--dsn', default=None, help='Run on a disposable database of this server')
+    parser.add_argument('--check', action='store_true', help='Fail if the counts exceed the baselines')
+    parser.add_argument('--bytes-tolerance', type=float, default=0.1)
+    parser.add_argument('--update', action='store_true', help='Save the counts as baselines')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    if args.dsn:
+        conn, drop = _disposable_database(args.dsn)
+        try:
+            results = run(sizes, args.case, conn)
+        finally:
+            drop()
+    else:
+        results = run(sizes, args.case)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print('{:<24} {:>8} {:>12} {:>12} {:>10}'.format(
+            'case', 'size', 'round trips', 'bytes sent', 'ms'
+        ))
+        for name, case_sizes in sorted(results.items()):
+            for size, res in sorted(case_sizes.items(), key=lambda x: int(x[0])):
+                print('{:<24} {:>8} {:>12} {:>12} {:>10.2f}'.format(
+                    name, size, res['round_trips'], res['bytes_sent'],
+                    res['elapsed'] * 1000
+                ))
+    if args.update:
+        save_baseline(results, args.baseline)
+    if args.check:
+        errors = check(results, load_baseline(args.baseline), args.bytes_tolerance)
+        for error in errors:
+            print('REGRESSION {}'.format(error), file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
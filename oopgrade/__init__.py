@@ -1,9 +1,33 @@
 from __future__ import absolute_import
+import sys
 
-try:
-    VERSION = __import__('pkg_resources') \
-        .get_distribution(__name__).version
-except Exception as e:
-    VERSION = 'unknown'
 
-from oopgrade.data import DataMigration
+def _get_version():
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        version = lambda name: __import__('pkg_resources') \
+            .get_distribution(name).version
+    try:
+        return version(__name__)
+    except Exception:
+        return 'unknown'
+
+
+if sys.version_info >= (3, 7):
+    # Resolved on first access, so `import oopgrade.cli` does not load lxml,
+    # ooquery and python-sql (nor pkg_resources).
+    def __getattr__(name):
+        if name == 'VERSION':
+            globals()['VERSION'] = _get_version()
+            return globals()['VERSION']
+        if name == 'DataMigration':
+            from oopgrade.data import DataMigration
+            return DataMigration
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name)
+        )
+else:
+    VERSION = _get_version()
+
+    from oopgrade.data import DataMigration
@@ -1,17 +1,9 @@
 # coding=utf-8
 from __future__ import absolute_import
 from __future__ import print_function
-import six
-from future import standard_library
-standard_library.install_aliases()
+# Only click is imported here: every subcommand imports what it needs, so
+# short commands like `oopgrade pubsub` do not pay for heavy dependencies.
 import click
-from tqdm import tqdm
-import psycopg2
-if six.PY2:
-    import ConfigParser as configparser
-else:
-    import configparser
-from osconf import config_from_environment
 
 
 class JSONParamType(click.ParamType):
@@ -25,12 +17,31 @@ class JSONParamType(click.ParamType):
             self.fail("{0} is not a valid json".format(value), param, ctx)
 
 
+def connection_params(conf):
+    """Get the psycopg2.connect keyword arguments (without dbname) from the
+    configuration.
+    """
+    params = {
+        'user': conf.get('db_user'),
+        'password': conf.get('db_password'),
+        'host': conf.get('db_host'),
+        'port': conf.get('db_port'),
+    }
+    return dict((k, v) for k, v in params.items() if v not in (None, '', 'False'))
+
+
 @click.group()
 @click.option('--config', required=False, default=None)
 @click.pass_context
 def oopgrade(ctx, config):
+    from osconf import config_from_environment
     ctx.obj = {}
     if config:
+        import six
+        if six.PY2:
+            import ConfigParser as configparser
+        else:
+            import configparser
         conf = configparser.ConfigParser()
         conf.read(config)
         ctx.obj = dict(conf.items('options'))
@@ -44,63 +55,333 @@ def requirements():
 
 
 @requirements.command()
+@click.option(
+    '--index-path', default=None,
+    help='Manifest index file (default: manifest_index from config or user cache)'
+)
+@click.option('--no-index', is_flag=True, help='Do not use the manifest index')
+@click.option(
+    '--single', is_flag=True,
+    help='Install all the requirements with a single pip invocation'
+)
+@click.option(
+    '--wheelhouse', default=None, type=click.Path(exists=True, file_okay=False),
+    help='Install offline from this wheels directory (implies --single)'
+)
+@click.option(
+    '--state-path', default=None,
+    help='Installed requirements state file (default: requirements_state from config or user cache)'
+)
+@click.option('--force', is_flag=True, help='Install requirements files even if they have not changed')
 @click.pass_obj
-def install(conf):
+def install(conf, index_path, no_index, single, wheelhouse, state_path, force):
     import os.path
+    import psycopg2
+    from tqdm import tqdm
     from oopgrade.oopgrade import get_installed_modules
-    from oopgrade.utils import install_requirements, pip_install_requirements
-    conn = psycopg2.connect(
-        dbname=conf['db_name'], user=conf['db_user'],
-        password=conf['db_password'], host=conf['db_host']
+    from oopgrade.utils import (
+        AddonsGraph, ManifestIndex, RequirementsState, default_index_path,
+        default_state_path, install_requirements, pip_install_requirements,
+        collect_requirements, pip_install_requirements_files
+    )
+    single = single or bool(wheelhouse)
+    state = RequirementsState(
+        state_path or conf.get('requirements_state') or default_state_path()
     )
     main_req = os.path.join(conf['root_path'], '..', 'requirements.txt')
-    if os.path.exists(main_req):
-        click.echo('Installing main requirements')
-        pip_install_requirements(main_req, silent=True)
-    click.echo('Getting installed modules...')
-    with conn:
-        with conn.cursor() as cursor:
-            modules = get_installed_modules(cursor)
-    conn.close()
-    done = []
-    for module in tqdm(modules, desc='Installing'):
-        if module in done:
-            continue
-        done += install_requirements(
-            module, conf['addons_path'], silent=True, done=done
-        )
+    conn = None
+    try:
+        if os.path.exists(main_req) and not single:
+            click.echo('Installing main requirements')
+            pip_install_requirements(main_req, silent=True, state=state, force=force)
+        click.echo('Getting installed modules...')
+        conn = psycopg2.connect(dbname=conf['db_name'], **connection_params(conf))
+        with conn:
+            with conn.cursor() as cursor:
+                modules = get_installed_modules(cursor)
+        conn.close()
+        conn = None
+        index = None
+        if not no_index:
+            index_path = index_path or conf.get('manifest_index') or \
+                default_index_path(conf['addons_path'])
+            index = ManifestIndex(index_path)
+        graph = AddonsGraph(conf['addons_path'], index=index)
+        if single:
+            requirements_files = collect_requirements(modules, graph)
+            if os.path.exists(main_req):
+                requirements_files.insert(0, main_req)
+            click.echo('Installing {} requirements files...'.format(
+                len(requirements_files)
+            ))
+            pip_install_requirements_files(
+                requirements_files, silent=True, wheelhouse=wheelhouse,
+                state=state, force=force
+            )
+        else:
+            done = []
+            for module in tqdm(modules, desc='Installing'):
+                if module in done:
+                    continue
+                done += install_requirements(
+                    module, conf['addons_path'], silent=True, done=done,
+                    graph=graph, state=state, force=force
+                )
+        graph.save()
+    finally:
+        if conn is not None:
+            conn.close()
+        state.save()
 
 
 @oopgrade.command()
 @click.option('--channel')
-@click.argument('method')
+@click.argument('method', required=False)
 @click.option('--kwargs', type=JSONParamType())
 @click.option('--n-retries', default=0, type=click.INT, help='Will retry method n times')
 @click.option(
     '--on-max-retries-method', type=click.STRING, help='If fails n times tou can provide alternative method'
 )
 @click.option('--on-max-retries-kwargs', type=JSONParamType(), help='Arguments for alternative method')
+@click.option(
+    '--from-file', type=click.File('r'), default=None,
+    help='Send the newline-delimited JSON messages of this file ("-" for stdin)'
+)
+@click.option('--batch-size', default=500, type=click.INT, help='Messages sent per round trip with --from-file')
+@click.option(
+    '--database', '-d', 'databases', multiple=True,
+    help='Send to the channel of this database instead of db_name (Python 3 only)'
+)
+@click.option(
+    '--pattern', 'patterns', multiple=True,
+    help='Send to the channels of the databases matching this shell-style pattern (Python 3 only)'
+)
 @click.pass_obj
-def pubsub(ctx, channel, method, kwargs, n_retries, on_max_retries_method, on_max_retries_kwargs):
+def pubsub(ctx, channel, method, kwargs, n_retries, on_max_retries_method, on_max_retries_kwargs,
+           from_file, batch_size, databases, patterns):
+    """Send METHOD to the subscribers of the channel.
+
+    With --from-file every line is a JSON object with the keys method and
+    optionally kwargs, n_retries, on_max_retries_method,
+    on_max_retries_kwargs and channel (--channel by default).
+
+    With --database or --pattern the message is sent to the channel of every
+    database concurrently.
+    """
     import json
-    from oopgrade.pubsub import send_msg
+    from oopgrade.pubsub import Publisher, build_msg, send_msg
     secret = ctx.get('secret')
     if not secret:
         raise ValueError('Secret (key: secret) not found in config')
     redis_url = ctx.get('redis_url')
     if not redis_url:
         raise ValueError('Redis URL (key: redis_url) not found in config')
+    if databases or patterns:
+        if from_file is not None:
+            raise click.UsageError('--from-file can not be used with --database or --pattern')
+        if not method:
+            raise click.UsageError('Missing argument METHOD')
+        from oopgrade.fanout import publish_fanout
+        databases = list(databases)
+        if patterns:
+            from oopgrade.runner import list_databases
+            databases += [
+                db for db in list_databases(connection_params(ctx), patterns)
+                if db not in databases
+            ]
+        msg = build_msg(
+            method, kwargs, n_retries, on_max_retries_method,
+            on_max_retries_kwargs
+        )
+        res = publish_fanout(redis_url, secret, channel, databases, msg)
+        for db_channel, sent_to in sorted(res['channels'].items()):
+            print('{}: {} nodes'.format(db_channel, sent_to))
+        for db_channel, error in sorted(res['errors'].items()):
+            click.echo('{}: failed: {}'.format(db_channel, error), err=True)
+        print('-> Message sent to {} channels and {} nodes in {:.3f}s, {} failed'.format(
+            len(res['channels']), sum(res['channels'].values()), res['elapsed'],
+            len(res['errors'])
+        ))
+        if res['errors']:
+            raise SystemExit(1)
+        return
     db_name = ctx.get('db_name')
     if not db_name:
         raise ValueError('Databse (key: db_name) not found in config')
-    channel = '{}.{}'.format(db_name, channel)
-    msg = {
-        'method': method,
-        'kwargs': kwargs or {},
-        'n_retries': n_retries or 0,
-        'on_max_retries_method': on_max_retries_method or False,
-        'on_max_retries_kwargs': on_max_retries_kwargs or {},
-    }
-    msg = json.dumps(msg)
-    sent_to = send_msg(redis_url, secret, channel, msg)
-    print('-> Message sent to {} nodes'.format(sent_to))
+    if from_file is None:
+        if not method:
+            raise click.UsageError('Missing argument METHOD (or --from-file)')
+        channel = '{}.{}'.format(db_name, channel)
+        msg = build_msg(
+            method, kwargs, n_retries, on_max_retries_method,
+            on_max_retries_kwargs
+        )
+        sent_to = send_msg(redis_url, secret, channel, msg)
+        print('-> Message sent to {} nodes'.format(sent_to))
+        return
+
+    def messages():
+        for lineno, line in enumerate(from_file, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                msg_channel = data.get('channel', channel)
+                if not msg_channel:
+                    raise ValueError('no channel')
+                yield '{}.{}'.format(db_name, msg_channel), build_msg(
+                    data['method'], data.get('kwargs'),
+                    data.get('n_retries', 0),
+                    data.get('on_max_retries_method', False),
+                    data.get('on_max_retries_kwargs')
+                )
+            except (ValueError, KeyError, AttributeError) as err:
+                raise click.BadParameter(
+                    'Invalid message at line {}: {}'.format(lineno, err),
+                    param_hint='--from-file'
+                )
+
+    # Validate all the messages before sending any of them
+    msgs = list(messages())
+    with Publisher(redis_url, secret) as publisher:
+        sent_to = publisher.publish_many(msgs, batch_size=batch_size)
+    print('-> {} messages sent to {} nodes'.format(len(sent_to), sum(sent_to)))
+
+
+@oopgrade.command()
+@click.argument('migration')
+@click.argument('databases', nargs=-1)
+@click.option(
+    '--pattern', 'patterns', multiple=True,
+    help='Run on the databases matching this shell-style pattern (e.g. "tenant_*")'
+)
+@click.option('--processes', '-j', default=4, type=click.INT, help='Databases migrated at the same time')
+@click.option('--installed-version', default=None, help='Installed version passed to the migration')
+@click.option('--json', 'as_json', is_flag=True, help='Output the report as JSON')
+@click.pass_obj
+def run(conf, migration, databases, patterns, processes, installed_version, as_json):
+    """Run MIGRATION on many databases concurrently.
+
+    MIGRATION is a `package.module:function` or a migration script defining
+    `migrate(cursor, installed_version)`. Each database is migrated in its own
+    transaction.
+    """
+    import json
+    import time
+    from oopgrade.runner import list_databases, run_migration
+    conn_params = connection_params(conf)
+    databases = list(databases)
+    if patterns:
+        databases += [
+            db for db in list_databases(conn_params, patterns)
+            if db not in databases
+        ]
+    if not databases:
+        raise click.UsageError('No databases given nor matching the patterns')
+    start = time.time()
+    results = []
+    for res in run_migration(
+            migration, databases, conn_params, processes=processes,
+            installed_version=installed_version):
+        results.append(res)
+        if not as_json:
+            click.echo('{status:<5} {database} ({elapsed:.2f}s){error}'.format(
+                status=res['status'], database=res['database'],
+                elapsed=res['elapsed'],
+                error=' {}'.format(res['error']) if res['error'] else ''
+            ))
+    elapsed = time.time() - start
+    failed = [r for r in results if r['status'] != 'ok']
+    if as_json:
+        click.echo(json.dumps({
+            'elapsed': elapsed, 'failed': len(failed), 'results': results
+        }, indent=2))
+    else:
+        click.echo('-> {} databases migrated in {:.2f}s, {} failed'.format(
+            len(results), elapsed, len(failed)
+        ))
+        for res in failed:
+            click.echo('\n{}:\n{}'.format(res['database'], res['traceback']), err=True)
+    if failed:
+        raise SystemExit(1)
+
+
+def _format_table(headers, rows):
+    widths = [
+        max(len(x) for x in col) for col in zip(headers, *rows)
+    ]
+    lines = [
+        '  '.join(v.ljust(w) for v, w in zip(line, widths)).rstrip()
+        for line in [headers, ['-' * w for w in widths]] + rows
+    ]
+    return '\n'.join(lines)
+
+
+@oopgrade.command()
+@click.argument('databases', nargs=-1)
+@click.option(
+    '--pattern', 'patterns', multiple=True,
+    help='Inspect the databases matching this shell-style pattern (e.g. "tenant_*")'
+)
+@click.option('--module', '-m', 'modules', multiple=True, help='Module to get the state and version of')
+@click.option('--table', '-t', 'tables', multiple=True, help='Table to check if it exists')
+@click.option('--column', '-c', 'columns', multiple=True, help='table.column to check if it exists')
+@click.option('--workers', '-j', default=8, type=click.INT, help='Databases queried at the same time')
+@click.option('--json', 'as_json', is_flag=True, help='Output the results as JSON')
+@click.pass_obj
+def inspect(conf, databases, patterns, modules, tables, columns, workers, as_json):
+    """Inspect modules and schema of many databases (read-only).
+
+    Without --module the number of installed modules is shown in the table
+    and all the not uninstalled modules are listed in the JSON output.
+    """
+    import json
+    from oopgrade.fleet import inspect_databases
+    from oopgrade.runner import list_databases
+    conn_params = connection_params(conf)
+    databases = list(databases)
+    if patterns:
+        databases += [
+            db for db in list_databases(conn_params, patterns)
+            if db not in databases
+        ]
+    if not databases and not patterns and conf.get('db_name'):
+        databases = [conf['db_name']]
+    if not databases:
+        raise click.UsageError('No databases given nor matching the patterns')
+    try:
+        results = inspect_databases(
+            conn_params, databases, modules=modules, tables=tables,
+            columns=columns, workers=workers
+        )
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+    if as_json:
+        click.echo(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        headers = ['database', 'postgres']
+        headers += list(modules) or ['installed']
+        headers += list(tables) + list(columns) + ['error']
+        rows = []
+        for res in results:
+            row = [res['database'], res['server_version'] or '']
+            if modules:
+                for module in modules:
+                    info = res['modules'].get(module) or {}
+                    if info.get('state') in ('installed', 'to upgrade'):
+                        row.append(info['version'] or info['state'])
+                    else:
+                        row.append(info.get('state') or '-')
+            else:
+                row.append(str(len([
+                    m for m in res['modules'].values()
+                    if m['state'] == 'installed'
+                ])))
+            for name in list(tables) + list(columns):
+                found = res['tables'].get(name, res['columns'].get(name))
+                row.append('' if found is None else 'yes' if found else 'no')
+            row.append(res['error'] or '')
+            rows.append(row)
+        click.echo(_format_table(headers, rows))
+    if any(res['error'] for res in results):
+        raise SystemExit(1)
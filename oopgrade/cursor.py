@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""Batch operations on any cursor.
+
+Helpers get either a raw psycopg2 cursor (as in the CLI), an OpenERP
+`sql_db.Cursor` or one of the oopgrade wrappers (:func:`oopgrade.instrument.wrap`,
+:class:`oopgrade.explain.ExplainCursor`). :class:`BatchCursor` gives all of
+them the same batch API and picks the fastest safe way for each one:
+
+- :meth:`BatchCursor.execute_many_values`: `psycopg2.extras.execute_values`
+  on raw psycopg2 cursors, pages of multi-row VALUES otherwise.
+- :meth:`BatchCursor.copy_rows`: `COPY FROM` when the psycopg2 cursor is
+  reachable through known wrappers, pages of INSERT otherwise (so a dry-run
+  only explains them).
+- :meth:`BatchCursor.fetch_iter`: server-side named cursor when the psycopg2
+  connection is reachable, `fetchmany` (or `fetchall`) otherwise.
+
+Example::
+
+    from oopgrade.cursor import batch_cursor
+
+    cursor = batch_cursor(cr)
+    cursor.execute_many_values(
+        'INSERT INTO res_partner_category (name, active) VALUES %s',
+        [(name, True) for name in names]
+    )
+    for partner_id, vat in cursor.fetch_iter('SELECT id, vat FROM res_partner'):
+        pass
+"""
+from __future__ import absolute_import
+from builtins import object
+from itertools import count
+import six
+from six import string_types
+
+from oopgrade.instrument import InstrumentedCursor, timer
+
+__all__ = [
+    'BatchCursor',
+    'batch_cursor',
+]
+
+
+_cursor_names = count(1)
+
+
+def _psycopg2_cursor_class():
+    try:
+        from psycopg2.extensions import cursor
+    except ImportError:
+        return None
+    return cursor
+
+
+def _copy_escape(value):
+    """Escape a value for the COPY text format."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if not isinstance(value, string_types):
+        value = str(value)
+    return (
+        value.replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class _CopyBuffer(object):
+    """File-like object streaming rows in COPY text format.
+
+    :param rows: iterable of tuples
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                break
+            self.buffer += '\t'.join(_copy_escape(v) for v in row) + '\n'
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _values_placeholder(query):
+    """Get the position of the only `%s` placeholder of a query (`%%` are
+    escaped percents).
+    """
+    positions = []
+    i = 0
+    while i < len(query):
+        if query[i] == '%':
+            if query[i + 1:i + 2] == 's':
+                positions.append(i)
+            i += 2
+        else:
+            i += 1
+    if len(positions) != 1:
+        raise ValueError(
+            'The query must have exactly one %s placeholder for the VALUES'
+        )
+    return positions[0]
+
+
+def _pages(rows, size):
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) >= size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+class BatchCursor(object):
+    """Cursor adapter adding batch operations.
+
+    Any attribute not defined here is taken from the wrapped cursor.
+
+    :param cursor: Database cursor
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _chain(self):
+        """Get the psycopg2 cursor reachable through known wrappers (or None)
+        and the first :class:`InstrumentedCursor` found on the way.
+        """
+        raw_class = _psycopg2_cursor_class()
+        instrumented = None
+        cursor = self.cursor
+        while cursor is not None:
+            if raw_class is not None and isinstance(cursor, raw_class):
+                return cursor, instrumented
+            if isinstance(cursor, InstrumentedCursor):
+                instrumented = instrumented or cursor
+                cursor = cursor.cursor
+            elif '_obj' in getattr(cursor, '__dict__', {}):
+                # OpenERP sql_db.Cursor
+                cursor = cursor._obj
+            else:
+                return None, instrumented
+        return None, instrumented
+
+    @property
+    def raw(self):
+        """The psycopg2 cursor, if reachable through known wrappers."""
+        return self._chain()[0]
+
+    def execute_many_values(self, query, rows, template=None, page_size=100):
+        """Execute a query with a VALUES list for many rows, one round trip
+        per page of rows.
+
+        :param query: Query with a single `%s` placeholder for the VALUES \
+        (literal percents escaped as `%%`), e.g. \
+        `INSERT INTO t (a, b) VALUES %s`
+        :param rows: iterable of tuples
+        :param template: Template of a row, e.g. `(%s, %s::date)`. A `%s` per \
+        value by default.
+        :param page_size: Rows per statement
+        :return: Number of rows affected
+        """
+        position = _values_placeholder(query)
+        total = 0
+        raw_class = _psycopg2_cursor_class()
+        if raw_class is not None and isinstance(self.cursor, raw_class):
+            from psycopg2.extras import execute_values
+            for page in _pages(rows, page_size):
+                execute_values(
+                    self.cursor, query, page, template=template,
+                    page_size=page_size
+                )
+                total += max(self.cursor.rowcount, 0)
+            return total
+        head, tail = query[:position], query[position + 2:]
+        for page in _pages(rows, page_size):
+            row_template = template or '({})'.format(
+                ', '.join(['%s'] * len(page[0]))
+            )
+            self.cursor.execute(
+                head + ', '.join([row_template] * len(page)) + tail,
+                [value for row in page for value in row]
+            )
+            rowcount = getattr(self.cursor, 'rowcount', None)
+            if isinstance(rowcount, six.integer_types) and rowcount > 0:
+                total += rowcount
+        return total
+
+    def copy_rows(self, table, rows, columns, page_size=1000):
+        """Insert many rows, with COPY when possible.
+
+        :param table: Table name
+        :param rows: iterable of tuples with the values of `columns`
+        :param columns: list of column names
+        :param page_size: Rows per INSERT statement when COPY is not used
+        :return: Number of rows inserted
+        """
+        counted = [0]
+
+        def counter(rows):
+            for row in rows:
+                counted[0] += 1
+                yield row
+
+        raw, instrumented = self._chain()
+        if raw is not None:
+            start = timer()
+            try:
+                raw.copy_from(
+                    _CopyBuffer(counter(rows)), table,
+                    columns=columns
+                )
+            finally:
+                if instrumented is not None:
+                    instrumented._record(
+                        'COPY {} ({}) FROM STDIN'.format(table, ', '.join(columns)),
+                        start
+                    )
+            return counted[0]
+        self.execute_many_values(
+            'INSERT INTO "{}" ({}) VALUES %s'.format(
+                table, ', '.join('"{}"'.format(c) for c in columns)
+            ),
+            counter(rows), page_size=page_size
+        )
+        return counted[0]
+
+    def fetch_iter(self, query, args=None, itersize=2000, name=None):
+        """Iterate over the rows of a query without loading all of them.
+
+        :param query: SELECT query
+        :param args: Query parameters
+        :param itersize: Rows fetched per round trip
+        :param name: Name of the server-side cursor, a unique one if None
+        """
+        raw = self.raw
+        connection = getattr(raw, 'connection', None)
+        if connection is not None:
+            if name is None:
+                name = 'oopgrade_fetch_iter_{}'.format(next(_cursor_names))
+            named = connection.cursor(
+                name, withhold=bool(getattr(connection, 'autocommit', False))
+            )
+            try:
+                named.itersize = itersize
+                named.execute(query, args)
+                for row in named:
+                    yield row
+            finally:
+                named.close()
+            return
+        self.cursor.execute(query, args)
+        if not hasattr(self.cursor, 'fetchmany'):
+            for row in self.cursor.fetchall():
+                yield row
+            return
+        while True:
+            rows = self.cursor.fetchmany(itersize)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+
+def batch_cursor(cursor):
+    """Get a :class:`BatchCursor` for a cursor (the cursor itself if it
+    already is one).
+    """
+    if isinstance(cursor, BatchCursor):
+        return cursor
+    return BatchCursor(cursor)
@@ -9,6 +9,7 @@ from ast import literal_eval
 
 from lxml import objectify
 from oopgrade.oopgrade import get_foreign_keys, logger
+from oopgrade.instrument import instrumented, wrap
 from ooquery import OOQuery
 from sql import Table
 
@@ -55,6 +56,14 @@ class DataMigration(object):
         self.search_params = search_params.copy()
         self.records = []
 
+    @property
+    def cursor(self):
+        return wrap(self._cursor)
+
+    @cursor.setter
+    def cursor(self, cursor):
+        self._cursor = cursor
+
     def _record(self, record):
         vals = {}
         noupdate = bool(
@@ -103,6 +112,7 @@ class DataMigration(object):
         self.cursor.execute(*sql)
         return self.cursor.fetchone()[0]
 
+    @instrumented(name='DataMigration.migrate')
     def migrate(self):
         obj = objectify.fromstring(self.content)
         t = Table('ir_model_data')
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Dry-run of migration helpers with EXPLAIN.
+
+Statements executed through an :class:`ExplainCursor` are run under
+`EXPLAIN` to collect their estimated cost (and actual time with `analyze`).
+Data modifying statements are never applied: with `analyze` they are executed
+inside a savepoint that is rolled back. Queries are executed once, with
+`analyze` their actual time is the time of that execution.
+
+Example::
+
+    from oopgrade.explain import dry_run
+
+    with dry_run(cursor, analyze=True) as explain_cursor:
+        set_defaults(explain_cursor, pool, {'res.partner': [('company_id', 1)]}, use_sql=True)
+        change_column_type(explain_cursor, {'res_partner': [('ref', 'text')]})
+    explain_cursor.log_plan()
+
+.. note:: Only queries (SELECT, VALUES, TABLE and WITH ... SELECT without
+          data modifying CTEs) are really executed, so the results of the
+          other statements are not available to the helpers. DDL statements
+          (which can not be explained) and COPY are skipped.
+"""
+from __future__ import absolute_import
+import json
+import logging
+from contextlib import contextmanager
+
+from oopgrade import instrument
+
+logger = logging.getLogger('openerp.oopgrade')
+
+__all__ = [
+    'ExplainCursor',
+    'dry_run',
+]
+
+QUERY_STATEMENTS = ('SELECT', 'VALUES', 'TABLE')
+
+
+def _seq_scans(plan):
+    """Get the relations scanned sequentially in a plan node and its
+    children.
+    """
+    tables = []
+    if plan.get('Node Type') == 'Seq Scan':
+        tables.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        tables.extend(_seq_scans(child))
+    return tables
+
+
+class ExplainCursor(object):
+    """Cursor wrapper explaining the statements instead of applying them.
+
+    Any attribute not defined here is taken from the wrapped cursor.
+
+    :param cursor: Database cursor to wrap
+    :param analyze: Use `EXPLAIN ANALYZE` inside a rolled back savepoint
+    """
+
+    def __init__(self, cursor, analyze=False):
+        self.cursor = cursor
+        self.analyze = analyze
+        self.steps = []
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _explain(self, query, args, analyze=False):
+        options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+        self.cursor.execute('SAVEPOINT oopgrade_explain')
+        try:
+            self.cursor.execute(
+                'EXPLAIN ({}) {}'.format(options, query), *args
+            )
+            res = self.cursor.fetchone()[0]
+        finally:
+            self.cursor.execute('ROLLBACK TO SAVEPOINT oopgrade_explain')
+        if not isinstance(res, list):
+            res = json.loads(res)
+        return res[0]
+
+    def _step(self, query, kind, executed):
+        step = {
+            'helper': instrument.current_helper(),
+            'query': query,
+            'kind': kind,
+            'total_cost': None,
+            'plan_rows': None,
+            'actual_time': None,
+            'seq_scans': [],
+            'executed': executed,
+            'error': None,
+        }
+        self.steps.append(step)
+        return step
+
+    def execute(self, query, *args):
+        kind = instrument.statement_kind(query)
+        dml = instrument.is_dml(query)
+        executed = not dml and kind in QUERY_STATEMENTS
+        step = self._step(query, kind, executed)
+        if executed or dml:
+            # Queries are explained without ANALYZE, the execution below
+            # gives their actual time
+            analyze = self.analyze and not executed
+            try:
+                explain = self._explain(query, args, analyze=analyze)
+            except Exception as err:
+                step['error'] = str(err)
+            else:
+                plan = explain['Plan']
+                step['total_cost'] = plan.get('Total Cost')
+                step['plan_rows'] = plan.get('Plan Rows')
+                if analyze:
+                    step['actual_time'] = explain.get(
+                        'Execution Time', plan.get('Actual Total Time')
+                    )
+                step['seq_scans'] = _seq_scans(plan)
+        if executed:
+            start = instrument.timer()
+            res = self.cursor.execute(query, *args)
+            if self.analyze:
+                step['actual_time'] = (instrument.timer() - start) * 1000
+            return res
+        logger.info('Dry-run: not executing %s', query)
+
+    def executemany(self, query, vars_list):
+        """Explain (or execute, for queries) the statement once for every
+        set of parameters.
+        """
+        for params in vars_list:
+            self.execute(query, params)
+
+    def copy_from(self, file, table, *args, **kwargs):
+        """COPY is never applied in a dry-run, only recorded."""
+        self._step('COPY {} FROM STDIN'.format(table), 'COPY', False)
+        logger.info('Dry-run: not copying to %s', table)
+
+    def copy_expert(self, sql, file, *args, **kwargs):
+        """COPY is never applied in a dry-run, only recorded."""
+        self._step(sql, 'COPY', False)
+        logger.info('Dry-run: not executing %s', sql)
+
+    def plan(self, order_by=None):
+        """Get the explained statements.
+
+        :param order_by: None to get them in execution order, or 'total_cost' \
+        or 'actual_time' to get the most expensive first.
+        :return: list of dicts with the keys helper, query, kind, total_cost, \
+        plan_rows, actual_time (ms), seq_scans, executed and error.
+        """
+        steps = [s.copy() for s in self.steps]
+        if order_by:
+            steps.sort(key=lambda s: s[order_by] or 0, reverse=True)
+        return steps
+
+    def log_plan(self, order_by=None):
+        """Log the explained statements."""
+        for step in self.plan(order_by):
+            if step['error']:
+                logger.warning(
+                    'Dry-run %s: error explaining %s: %s',
+                    step['helper'], step['query'], step['error']
+                )
+                continue
+            logger.info(
+                'Dry-run %s: cost=%s rows=%s time=%sms seq_scans=%s: %s',
+                step['helper'], step['total_cost'], step['plan_rows'],
+                step['actual_time'], ','.join(step['seq_scans']) or '-',
+                step['query']
+            )
+
+
+@contextmanager
+def dry_run(cursor, analyze=False):
+    """Context manager yielding an :class:`ExplainCursor` to pass to the
+    helpers. Helper calls are tracked so each statement is attributed to the
+    helper that executed it.
+
+    :param cursor: Database cursor
+    :param analyze: Use `EXPLAIN ANALYZE` inside a rolled back savepoint
+    """
+    explain_cursor = ExplainCursor(cursor, analyze=analyze)
+    with instrument.collect():
+        yield explain_cursor
@@ -0,0 +1,91 @@
+# encoding: utf-8
+"""Concurrent publishing of one message to many databases.
+
+The message is signed once and published to `<db>.<channel>` for every
+database concurrently over one asyncio event loop (Python 3 and redis>=4.2
+only).
+
+The module has no `async` syntax, so it can be byte-compiled by Python 2,
+where :func:`publish_fanout` raises an error.
+
+Example::
+
+    from oopgrade.fanout import publish_fanout
+    from oopgrade.pubsub import build_msg
+
+    res = publish_fanout(
+        redis_url, secret, 'pubsub', ['tenant1', 'tenant2'],
+        build_msg('reload_cache')
+    )
+    print(res['channels'], res['elapsed'])
+"""
+import time
+
+import six
+
+__all__ = [
+    'publish_fanout',
+]
+
+
+def publish_fanout(redis_url, secret, channel, databases, msg, connection=None, concurrency=50):
+    """Publish `msg` to `<db>.<channel>` for every database, in a new event
+    loop.
+
+    :param redis_url: Redis URL
+    :param secret: Secret to sign the message
+    :param channel: Channel name without the database prefix
+    :param databases: list of database names
+    :param msg: Message to sign and publish
+    :param connection: Optional `redis.asyncio` client to use instead of \
+    creating one from `redis_url`.
+    :param concurrency: Maximum number of messages in flight
+    :return: dict with the keys channels ({channel: number of subscribers \
+    that received the message}), errors ({channel: error message} of the \
+    failed publishes) and elapsed (seconds).
+    """
+    if six.PY2:
+        raise Exception('Publishing to many databases requires Python 3')
+    import asyncio
+    from itsdangerous import Signer
+    signed_msg = Signer(secret).sign(msg)
+    channels = ['{}.{}'.format(db, channel) for db in databases]
+    loop = asyncio.new_event_loop()
+    try:
+        own_connection = connection is None
+        if own_connection:
+            from redis.asyncio import from_url
+            connection = from_url(redis_url, max_connections=concurrency)
+        start = time.time()
+        tasks = []
+        pending = set()
+        try:
+            for db_channel in channels:
+                if len(pending) >= concurrency:
+                    _, pending = loop.run_until_complete(asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    ))
+                task = loop.create_task(
+                    connection.publish(db_channel, signed_msg)
+                )
+                tasks.append(task)
+                pending.add(task)
+            if pending:
+                loop.run_until_complete(asyncio.wait(pending))
+        finally:
+            if own_connection:
+                loop.run_until_complete(
+                    connection.connection_pool.disconnect()
+                )
+        res = {'channels': {}, 'errors': {}, 'elapsed': time.time() - start}
+        for db_channel, task in zip(channels, tasks):
+            error = task.exception()
+            if error is None:
+                res['channels'][db_channel] = task.result()
+            else:
+                res['errors'][db_channel] = '{}: {}'.format(
+                    type(error).__name__, error
+                )
+        return res
+    finally:
+        loop.close()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Read-only introspection of many databases.
+
+Module states and versions and some schema facts of every database are
+queried concurrently by a bounded thread pool, with one read-only connection
+per database and only plain SQL (no ORM pool is needed).
+
+Example::
+
+    from oopgrade.fleet import inspect_databases
+
+    conn_params = {'user': 'erp', 'host': 'localhost'}
+    for res in inspect_databases(
+            conn_params, ['db1', 'db2'], modules=['base', 'giscedata_facturacio'],
+            columns=['res_partner.vat']):
+        print(res['database'], res['modules'], res['columns'])
+"""
+from __future__ import absolute_import
+import logging
+import time
+
+logger = logging.getLogger('openerp.oopgrade')
+
+__all__ = [
+    'inspect_database',
+    'inspect_databases',
+]
+
+
+def _split_column(column):
+    table, sep, name = column.partition('.')
+    if not sep or not table or not name:
+        raise ValueError('Column {} is not table.column'.format(column))
+    return table, name
+
+
+def _query_modules(cursor, modules=None):
+    if modules:
+        cursor.execute(
+            "SELECT name, state, latest_version FROM ir_module_module "
+            "WHERE name = ANY(%s)",
+            (list(modules), )
+        )
+    else:
+        cursor.execute(
+            "SELECT name, state, latest_version FROM ir_module_module "
+            "WHERE state != 'uninstalled'"
+        )
+    res = dict(
+        (name, {'state': state, 'version': version})
+        for name, state, version in cursor.fetchall()
+    )
+    for name in modules or []:
+        res.setdefault(name, {'state': None, 'version': None})
+    return res
+
+
+def _query_tables(cursor, tables):
+    cursor.execute(
+        "SELECT relname FROM pg_class "
+        "WHERE relkind IN ('r', 'v', 'm', 'p') AND relname = ANY(%s) "
+        "AND pg_table_is_visible(oid)",
+        (list(tables), )
+    )
+    found = set(x[0] for x in cursor.fetchall())
+    return dict((table, table in found) for table in tables)
+
+
+def _query_columns(cursor, columns):
+    cursor.execute(
+        "SELECT c.relname || '.' || a.attname FROM pg_attribute a "
+        "JOIN pg_class c ON c.oid = a.attrelid "
+        "WHERE a.attnum > 0 AND NOT a.attisdropped "
+        "AND pg_table_is_visible(c.oid) AND c.relname = ANY(%s) "
+        "AND c.relname || '.' || a.attname = ANY(%s)",
+        (list(set(_split_column(c)[0] for c in columns)), list(columns))
+    )
+    found = set(x[0] for x in cursor.fetchall())
+    return dict((column, column in found) for column in columns)
+
+
+def inspect_database(database, conn_params, modules=None, tables=None, columns=None):
+    """Inspect one database with a read-only connection.
+
+    :param database: Database name
+    :param conn_params: psycopg2.connect keyword arguments (without dbname)
+    :param modules: Module names to get the state and version of. All the \
+    not uninstalled modules if None.
+    :param tables: Table names to check if they exist
+    :param columns: `table.column` names to check if they exist
+    :return: dict with the keys database, server_version, modules \
+    ({name: {'state', 'version'}}, state and version are None for unknown \
+    modules), tables ({name: bool}), columns ({name: bool}), error and elapsed.
+    """
+    import psycopg2
+    for column in columns or []:
+        _split_column(column)
+    start = time.time()
+    res = {
+        'database': database,
+        'server_version': None,
+        'modules': {},
+        'tables': {},
+        'columns': {},
+        'error': None,
+    }
+    try:
+        conn = psycopg2.connect(dbname=database, **conn_params)
+        try:
+            conn.set_session(readonly=True)
+            with conn.cursor() as cursor:
+                cursor.execute("SHOW server_version")
+                res['server_version'] = cursor.fetchone()[0]
+                res['modules'] = _query_modules(cursor, modules)
+                if tables:
+                    res['tables'] = _query_tables(cursor, tables)
+                if columns:
+                    res['columns'] = _query_columns(cursor, columns)
+        finally:
+            conn.close()
+    except Exception as err:
+        logger.warning('Error inspecting %s: %s', database, err)
+        res['error'] = '{}: {}'.format(type(err).__name__, err)
+    res['elapsed'] = time.time() - start
+    return res
+
+
+def inspect_databases(conn_params, databases, modules=None, tables=None, columns=None, workers=8):
+    """Inspect many databases concurrently.
+
+    :param conn_params: psycopg2.connect keyword arguments (without dbname)
+    :param databases: list of database names
+    :param workers: Maximum number of databases queried at the same time
+    :return: list of :func:`inspect_database` results, in `databases` order.
+    """
+    from multiprocessing.pool import ThreadPool
+    for column in columns or []:
+        _split_column(column)
+    if not databases:
+        return []
+
+    def inspect(database):
+        return inspect_database(database, conn_params, modules, tables, columns)
+
+    pool = ThreadPool(max(1, min(workers, len(databases))))
+    try:
+        return pool.map(inspect, databases)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""Query instrumentation for oopgrade helpers.
+
+When enabled (globally with :func:`enable` or inside a :func:`collect`
+block), every oopgrade helper wraps the cursor it receives with an
+:class:`InstrumentedCursor` that records the wall time, rowcount and calling
+helper of each statement.
+
+Example::
+
+    from oopgrade import instrument
+
+    instrument.enable(slow_threshold=1.0)
+    # ... run migration helpers ...
+    instrument.log_summary(top=20)
+    instrument.disable()
+"""
+from __future__ import absolute_import
+import functools
+from contextlib import contextmanager
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger('openerp.oopgrade')
+
+timer = getattr(time, 'perf_counter', time.time)
+
+__all__ = [
+    'QueryStats',
+    'InstrumentedCursor',
+    'enable',
+    'disable',
+    'is_enabled',
+    'get_stats',
+    'wrap',
+    'collect',
+    'span',
+    'add_listener',
+    'remove_listener',
+    'instrumented',
+    'current_helper',
+    'log_summary',
+    'statement_kind',
+    'is_dml',
+]
+
+DML_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'MERGE')
+MAIN_STATEMENTS = DML_STATEMENTS + ('SELECT', 'VALUES', 'TABLE')
+
+_tokens = re.compile(
+    r"'(?:[^']|'')*'|\"[^\"]*\"|--[^\n]*|/\*.*?\*/|[()]|\w+", re.DOTALL
+)
+
+
+def _keywords(query):
+    """Yield the (depth, word) of the unquoted words of a query."""
+    depth = 0
+    for match in _tokens.finditer(query):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token[0] not in '\'"-/':
+            yield depth, token.upper()
+
+
+def statement_kind(query):
+    """Get the kind of a statement: its first keyword (e.g. SELECT or ALTER)
+    or, for `WITH` statements, the one of the main statement after the common
+    table expressions.
+    """
+    words = _keywords(query)
+    for _, word in words:
+        if word != 'WITH':
+            return word
+        for depth, word in words:
+            if not depth and word in MAIN_STATEMENTS:
+                return word
+        return 'WITH'
+    return None
+
+
+def is_dml(query):
+    """Whether a statement modifies rows: INSERT, UPDATE, DELETE, MERGE,
+    `COPY ... FROM` and `WITH` statements with any of them.
+    """
+    words = list(_keywords(query))
+    if not words:
+        return False
+    first = words[0][1]
+    if first == 'COPY':
+        return 'FROM' in [word for depth, word in words if not depth]
+    if first == 'WITH':
+        return any(word in DML_STATEMENTS for _, word in words)
+    return first in DML_STATEMENTS
+
+
+class QueryStats(object):
+    """Aggregated statistics of the executed statements.
+
+    Statements are aggregated by calling helper and SQL query (without
+    parameters).
+    """
+
+    def __init__(self):
+        self.statements = {}
+        self.lock = threading.Lock()
+
+    def record(self, helper, query, duration, rowcount):
+        """Record a statement execution.
+
+        :param helper: Name of the calling helper
+        :param query: SQL query
+        :param duration: Wall time in seconds
+        :param rowcount: Rows affected or returned (-1 if unknown)
+        """
+        with self.lock:
+            stat = self.statements.get((helper, query))
+            if stat is None:
+                stat = {
+                    'helper': helper, 'query': query, 'calls': 0,
+                    'total_time': 0.0, 'max_time': 0.0, 'rows': 0
+                }
+                self.statements[(helper, query)] = stat
+            stat['calls'] += 1
+            stat['total_time'] += duration
+            stat['max_time'] = max(stat['max_time'], duration)
+            if rowcount is not None and rowcount > 0:
+                stat['rows'] += rowcount
+
+    @property
+    def total_time(self):
+        return sum(s['total_time'] for s in self.statements.values())
+
+    @property
+    def total_calls(self):
+        return sum(s['calls'] for s in self.statements.values())
+
+    @property
+    def total_rows(self):
+        return sum(s['rows'] for s in self.statements.values())
+
+    @property
+    def dml_rows(self):
+        """Rows affected by data modifying statements, leaving out the rows
+        returned by queries.
+        """
+        return sum(
+            s['rows'] for s in self.statements.values() if is_dml(s['query'])
+        )
+
+    def summary(self, top=10):
+        """Get the statements with most total time.
+
+        :param top: Number of statements to return, None for all
+        :return: list of dicts with the keys helper, query, calls, total_time, \
+        max_time and rows, sorted by total_time.
+        """
+        stats = sorted(
+            self.statements.values(), key=lambda s: s['total_time'],
+            reverse=True
+        )
+        if top is not None:
+            stats = stats[:top]
+        return [s.copy() for s in stats]
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}
+
+
+class _State(threading.local):
+    def __init__(self):
+        self.helpers = []
+        self.collectors = []
+
+
+_state = _State()
+_config = {'stats': None, 'slow_threshold': None}
+_listeners = []
+
+
+def _active_stats():
+    stats = list(_state.collectors)
+    if _config['stats'] is not None:
+        stats.append(_config['stats'])
+    return stats
+
+
+def current_helper():
+    """Get the name of the helper being executed, like \
+    `MigrationHelper.init_model > table_exists`, or None.
+    """
+    if not _state.helpers:
+        return None
+    return ' > '.join(_state.helpers)
+
+
+class InstrumentedCursor(object):
+    """Cursor wrapper recording statement timings.
+
+    Any attribute not defined here is taken from the wrapped cursor.
+
+    :param cursor: Database cursor to wrap
+    :param stats: :class:`QueryStats` where statements are recorded. If None \
+    they are recorded in the global stats and the active :func:`collect` ones.
+    :param slow_threshold: Log statements slower than this number of seconds. \
+    Defaults to the one passed to :func:`enable`.
+    """
+
+    def __init__(self, cursor, stats=None, slow_threshold=None):
+        self.cursor = cursor
+        self.stats = stats
+        self.slow_threshold = slow_threshold
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def _record(self, query, start):
+        duration = timer() - start
+        helper = current_helper()
+        rowcount = getattr(self.cursor, 'rowcount', None)
+        if not isinstance(rowcount, int):
+            rowcount = None
+        if self.stats is not None:
+            targets = [self.stats]
+        else:
+            targets = _active_stats()
+        for stats in targets:
+            stats.record(helper, query, duration, rowcount)
+        if _listeners:
+            _notify(query, 'sql', start, duration, {
+                'helper': helper, 'rowcount': rowcount
+            })
+        slow_threshold = self.slow_threshold
+        if slow_threshold is None:
+            slow_threshold = _config['slow_threshold']
+        if slow_threshold is not None and duration >= slow_threshold:
+            logger.warning(
+                'Slow query (%.3fs, %s rows) in %s: %s',
+                duration, rowcount, helper, query
+            )
+        return duration
+
+    def execute(self, query, *args, **kwargs):
+        start = timer()
+        try:
+            return self.cursor.execute(query, *args, **kwargs)
+        finally:
+            self._record(query, start)
+
+    def executemany(self, query, *args, **kwargs):
+        start = timer()
+        try:
+            return self.cursor.executemany(query, *args, **kwargs)
+        finally:
+            self._record(query, start)
+
+    def copy_from(self, file, table, *args, **kwargs):
+        columns = kwargs.get('columns')
+        if columns is None and len(args) >= 4:
+            columns = args[3]
+        query = 'COPY {}{} FROM STDIN'.format(
+            table, ' ({})'.format(', '.join(columns)) if columns else ''
+        )
+        start = timer()
+        try:
+            return self.cursor.copy_from(file, table, *args, **kwargs)
+        finally:
+            self._record(query, start)
+
+    def copy_expert(self, sql, file, *args, **kwargs):
+        start = timer()
+        try:
+            return self.cursor.copy_expert(sql, file, *args, **kwargs)
+        finally:
+            self._record(sql, start)
+
+
+def enable(slow_threshold=None, stats=None):
+    """Enable the instrumentation of oopgrade helpers.
+
+    :param slow_threshold: Log statements slower than this number of seconds
+    :param stats: :class:`QueryStats` to use, a new one is created if None
+    :return: the :class:`QueryStats` where statements are recorded
+    """
+    if stats is None:
+        stats = QueryStats()
+    _config['stats'] = stats
+    _config['slow_threshold'] = slow_threshold
+    return stats
+
+
+def disable():
+    """Disable the instrumentation of oopgrade helpers."""
+    _config['stats'] = None
+    _config['slow_threshold'] = None
+
+
+def is_enabled():
+    return bool(_listeners) or bool(_active_stats())
+
+
+def add_listener(listener):
+    """Add a listener notified of every helper, statement and :func:`span`.
+
+    Listeners must implement `on_span(name, category, start, duration, args)`
+    where `start` is a :data:`timer` value and `duration` is in seconds, and
+    can implement `on_start(name, category)`, called when a helper or a span
+    (but not a statement) starts. Adding a listener enables the
+    instrumentation of the helpers.
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+def _notify_start(name, category):
+    for listener in list(_listeners):
+        on_start = getattr(listener, 'on_start', None)
+        if on_start is not None:
+            on_start(name, category)
+
+
+def _notify(name, category, start, duration, args=None):
+    for listener in list(_listeners):
+        listener.on_span(name, category, start, duration, args or {})
+
+
+@contextmanager
+def span(name, category='oopgrade', **args):
+    """Context manager notifying listeners of a named span of time, e.g. a
+    whole migration or a file load.
+    """
+    if not _listeners:
+        yield
+        return
+    _notify_start(name, category)
+    start = timer()
+    try:
+        yield
+    finally:
+        _notify(name, category, start, timer() - start, args)
+
+
+def get_stats():
+    """Get the current :class:`QueryStats` or None if not enabled."""
+    return _config['stats']
+
+
+def wrap(cursor):
+    """Wrap a cursor with an :class:`InstrumentedCursor` if instrumentation \
+    is enabled, otherwise return it as is.
+    """
+    if isinstance(cursor, InstrumentedCursor) or not is_enabled():
+        return cursor
+    return InstrumentedCursor(cursor)
+
+
+@contextmanager
+def collect(stats=None):
+    """Context manager collecting the statements executed inside it, even if
+    instrumentation is not globally enabled.
+
+    :param stats: :class:`QueryStats` to use, a new one is created if None
+    :return: the :class:`QueryStats` where statements are recorded
+    """
+    if stats is None:
+        stats = QueryStats()
+    _state.collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _state.collectors.remove(stats)
+
+
+def instrumented(func=None, name=None):
+    """Decorator to instrument an oopgrade helper.
+
+    If the first argument is a cursor (has an `execute` method) it is wrapped
+    with :func:`wrap`. Statements executed while the helper runs are
+    attributed to it.
+
+    :param name: Helper name, defaults to the function name
+    """
+    if func is None:
+        return lambda f: instrumented(f, name=name)
+    helper_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_enabled():
+            return func(*args, **kwargs)
+        if args and hasattr(args[0], 'execute'):
+            args = (wrap(args[0]),) + args[1:]
+        _state.helpers.append(helper_name)
+        if _listeners:
+            _notify_start(helper_name, 'helper')
+        start = timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _state.helpers.pop()
+            if _listeners:
+                _notify(helper_name, 'helper', start, timer() - start)
+    return wrapper
+
+
+def log_summary(top=10, stats=None):
+    """Log the statements with most total time.
+
+    :param top: Number of statements to log
+    :param stats: :class:`QueryStats`, defaults to the current one
+    :return: the summary as returned by :meth:`QueryStats.summary`
+    """
+    if stats is None:
+        stats = get_stats()
+    if stats is None:
+        return []
+    summary = stats.summary(top)
+    logger.info(
+        'Executed %s statements in %.3fs. Top %s by total time:',
+        stats.total_calls, stats.total_time, len(summary)
+    )
+    for stat in summary:
+        logger.info(
+            '%.3fs total, %.3fs max, %s calls, %s rows in %s: %s',
+            stat['total_time'], stat['max_time'], stat['calls'],
+            stat['rows'], stat['helper'], stat['query']
+        )
+    return summary
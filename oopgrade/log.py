@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from .oopgrade import table_exists
+from .cursor import batch_cursor
+from .instrument import instrumented
 
 
+@instrumented
 def log_xml_id(cr, module, xml_id):
     """
     Log xml_ids at load time in the records table.
@@ -30,6 +33,9 @@ def log_xml_id(cr, module, xml_id):
     and expect to keep working on it happily ever after. Do not perform
     this routine on your production database.
 
+    - To record all the xml ids of a module load use :class:`XmlIdRecorder`,
+    which needs a few queries per thousand ids instead of four per id.
+
     :param module: The module that contains the xml_id
     :param xml_id: the xml_id, with or without 'module.' prefix
     """
@@ -56,3 +62,101 @@ def log_xml_id(cr, module, xml_id):
                 "(module, model, name, type) values(%s, %s, %s, %s)",
                 (module, record[0], xml_id, 'xmlid'))
 
+
+class XmlIdRecorder(object):
+    """Buffered :func:`log_xml_id` for a whole module load.
+
+    The existence of the records table is checked once and the records
+    already logged for the module are preloaded. New xml ids are buffered and
+    resolved and inserted in bulk every `buffer_size` ids and when the
+    recorder is closed, so use it as a context manager around the module
+    load::
+
+        with XmlIdRecorder(cr, 'module_name') as recorder:
+            for xml_id in xml_ids:
+                recorder.record(xml_id)
+
+    Unlike :func:`log_xml_id` the model of the xml ids is read when the buffer
+    is flushed, so records created later in the same load are found.
+
+    :param cr: Database cursor
+    :param module: The module that contains the xml_ids
+    :param buffer_size: Number of xml ids to buffer before flushing them
+    """
+
+    def __init__(self, cr, module, buffer_size=1000):
+        self.cr = cr
+        self.module = module
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.seen = set()
+        self.enabled = table_exists(cr, 'openupgrade_record')
+        self.logged = set()
+        if self.enabled:
+            cr.execute(
+                "SELECT model, name FROM openupgrade_record "
+                "WHERE module = %s AND type = %s",
+                (module, 'xmlid'))
+            self.logged = set(tuple(x) for x in cr.fetchall())
+
+    def record(self, xml_id):
+        """Buffer a xml_id, with or without 'module.' prefix."""
+        if not self.enabled:
+            return
+        if '.' not in xml_id:
+            xml_id = '%s.%s' % (self.module, xml_id)
+        if xml_id in self.seen:
+            return
+        self.seen.add(xml_id)
+        self.pending.append(xml_id)
+        if len(self.pending) >= self.buffer_size:
+            self.flush()
+
+    @instrumented(name='XmlIdRecorder.flush')
+    def flush(self):
+        """Insert the records of the buffered xml ids.
+
+        :return: Number of records inserted
+        """
+        if not self.pending:
+            return 0
+        names = {}
+        for xml_id in self.pending:
+            module, name = xml_id.split('.', 1)
+            names.setdefault(module, []).append(name)
+        self.pending = []
+        rows = []
+        for module, module_names in sorted(names.items()):
+            self.cr.execute(
+                "SELECT name, model FROM ir_model_data "
+                "WHERE module = %s AND name = ANY(%s)",
+                (module, module_names))
+            found = dict(self.cr.fetchall())
+            for name in module_names:
+                xml_id = '%s.%s' % (module, name)
+                model = found.get(name)
+                if model is None:
+                    # Not created yet, may be found if it is recorded again
+                    self.seen.discard(xml_id)
+                    continue
+                if (model, xml_id) in self.logged:
+                    continue
+                self.logged.add((model, xml_id))
+                rows.append((self.module, model, xml_id, 'xmlid'))
+        if rows:
+            batch_cursor(self.cr).execute_many_values(
+                "INSERT INTO openupgrade_record "
+                "(module, model, name, type) VALUES %s",
+                rows, page_size=max(self.buffer_size, 1))
+        return len(rows)
+
+    def close(self):
+        """Flush the buffered xml ids."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
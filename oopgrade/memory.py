@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Memory profiling of migration steps.
+
+:class:`MemoryProfiler` is an instrumentation listener recording, for every
+helper call and span, the peak memory allocated by Python (with
+`tracemalloc`, when available), the peak RSS of the process and the top
+allocation sites.
+
+Example::
+
+    from oopgrade.memory import MemoryProfiler
+
+    helper = MigrationHelper(cursor, 'module_name', report=True)
+    with MemoryProfiler(report=helper.report):
+        helper.update_xml_records('menu.xml', update_record_ids=ids)
+    helper.report.write_json('/tmp/migration_report.json')
+
+.. note:: `tracemalloc` slows down Python code noticeably, use it only to
+          size the migration workers.
+"""
+from __future__ import absolute_import
+import os
+import threading
+
+from oopgrade import instrument
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+__all__ = [
+    'MemoryProfiler',
+    'get_rss',
+]
+
+
+def get_rss():
+    """Get the resident set size of the current process in bytes, or None if
+    it can not be read.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is the peak RSS, in KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname()[0] == 'Darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+class _RSSSampler(threading.Thread):
+    """Thread sampling the RSS of the process to get its peak while each
+    frame is open.
+    """
+
+    def __init__(self, interval):
+        super(_RSSSampler, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.frames = []
+
+    def sample(self):
+        rss = get_rss()
+        if rss is None:
+            return
+        with self.lock:
+            for frame in self.frames:
+                if rss > frame['rss']:
+                    frame['rss'] = rss
+
+    def push(self, frame):
+        frame['rss'] = get_rss() or 0
+        with self.lock:
+            self.frames.append(frame)
+
+    def pop(self, frame):
+        self.sample()
+        with self.lock:
+            self.frames.remove(frame)
+        return frame['rss']
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class MemoryProfiler(object):
+    """Instrumentation listener recording the memory used by each step.
+
+    :param report: Optional :class:`oopgrade.report.MigrationReport` where \
+    the records are added.
+    :param use_tracemalloc: Trace Python allocations with `tracemalloc` to \
+    get the peak allocated memory and the top allocation sites.
+    :param top_allocations: Number of allocation sites recorded for each \
+    outermost step (0 to disable them).
+    :param rss_interval: Seconds between RSS samples, None to disable the \
+    sampling.
+
+    Steps are tracked per thread, so a profiler can be shared by the threads
+    of a migration.
+    """
+
+    def __init__(self, report=None, use_tracemalloc=True, top_allocations=5,
+                 rss_interval=0.1):
+        self.report = report
+        self.use_tracemalloc = use_tracemalloc and tracemalloc is not None
+        self.top_allocations = top_allocations
+        self.rss_interval = rss_interval
+        self.records = []
+        self._local = threading.local()
+        self.sampler = None
+        self.started_tracemalloc = False
+
+    @property
+    def frames(self):
+        """Stack of the steps open in the current thread."""
+        frames = getattr(self._local, 'frames', None)
+        if frames is None:
+            frames = self._local.frames = []
+        return frames
+
+    def start(self):
+        """Start profiling."""
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        if self.rss_interval:
+            self.sampler = _RSSSampler(self.rss_interval)
+            self.sampler.start()
+        instrument.add_listener(self)
+        return self
+
+    def stop(self):
+        """Stop profiling."""
+        instrument.remove_listener(self)
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def on_start(self, name, category):
+        frames = self.frames
+        frame = {'peak': 0, 'snapshot': None, 'current': 0, 'rss': 0}
+        if self.use_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                parent = frames[-1]
+                parent['peak'] = max(parent['peak'], peak)
+            frame['current'] = current
+            reset_peak = getattr(tracemalloc, 'reset_peak', None)
+            if reset_peak is not None:
+                reset_peak()
+            if self.top_allocations and not frames:
+                frame['snapshot'] = tracemalloc.take_snapshot()
+        if self.sampler is not None:
+            self.sampler.push(frame)
+        frames.append(frame)
+
+    def on_span(self, name, category, start, duration, args):
+        frames = self.frames
+        if category == 'sql' or not frames:
+            return
+        frame = frames.pop()
+        record = {
+            'name': name,
+            'category': category,
+            'depth': len(frames),
+            'elapsed': duration,
+            'peak_traced': None,
+            'traced_delta': None,
+            'peak_rss': None,
+            'top_allocations': [],
+        }
+        if self.use_tracemalloc:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['peak'], peak)
+            if frames:
+                parent = frames[-1]
+                parent['peak'] = max(parent['peak'], peak)
+            record['peak_traced'] = peak
+            record['traced_delta'] = current - frame['current']
+            if frame['snapshot'] is not None:
+                stats = tracemalloc.take_snapshot().compare_to(
+                    frame['snapshot'], 'lineno'
+                )
+                record['top_allocations'] = [
+                    {'site': str(stat.traceback[0]), 'size': stat.size_diff,
+                     'count': stat.count_diff}
+                    for stat in stats[:self.top_allocations]
+                ]
+        if self.sampler is not None:
+            record['peak_rss'] = self.sampler.pop(frame)
+        self.records.append(record)
+        if self.report is not None:
+            self.report.memory.append(record)
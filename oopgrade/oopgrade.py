@@ -5,8 +5,10 @@ if six.PY3:
     from builtins import range
 import os
 import logging
-from tqdm import tqdm
 from six import string_types
+from .cursor import batch_cursor
+from .instrument import instrumented, span, wrap
+from .report import MigrationReport, report_step
 
 logger = logging.getLogger('openerp.oopgrade')
 
@@ -33,11 +35,14 @@ __all__ = [
     'load_access_rules_from_model_name',
     'delete_record',
     'load_translation',
+    'load_translations_bulk',
+    'load_translations_file',
     'MigrationHelper',
     'update_module_from_model_data',
 ]
 
 
+@instrumented
 def delete_record(cursor, module_name, record_names):
     import pooler
     uid = 1
@@ -98,6 +103,7 @@ def delete_record(cursor, module_name, record_names):
             )
 
 
+@instrumented
 def load_data(cr, module_name, filename, idref=None, mode='update'):
     """
     Load an xml or csv data file from your post script. The usual case for this is the
@@ -141,7 +147,48 @@ def load_data(cr, module_name, filename, idref=None, mode='update'):
         fp.close()
 
 
-def load_data_records(cr, module_name, filename, record_ids, mode='update', multi=False):
+def _index_xml_ids(doc):
+    """Index the elements of a parsed XML document by their id attribute.
+
+    :param doc: Parsed document (lxml ElementTree)
+    :return: a dict with the id as key and a list of (element, parent) tuples \
+    in document order as value.
+    """
+    from lxml import etree
+    index = {}
+    for element in doc.iter(tag=etree.Element):
+        record_id = element.get('id')
+        if record_id is not None:
+            index.setdefault(record_id, []).append(
+                (element, element.getparent())
+            )
+    return index
+
+
+def _parse_xml_data(xml_path, cache=None):
+    """Parse an XML data file and index its ids.
+
+    :param xml_path: Path to the XML file
+    :param cache: Optional dict used to keep parsed documents between calls. \
+    Entries are keyed by path and invalidated when the file mtime changes.
+    :return: a tuple (doc, index) as returned by `_index_xml_ids`
+    """
+    from lxml import etree
+    mtime = os.path.getmtime(xml_path)
+    if cache is not None and xml_path in cache:
+        cached_mtime, doc, index = cache[xml_path]
+        if cached_mtime == mtime:
+            return doc, index
+    with span('parse {}'.format(xml_path), 'load'):
+        doc = etree.parse(xml_path)
+        index = _index_xml_ids(doc)
+    if cache is not None:
+        cache[xml_path] = (mtime, doc, index)
+    return doc, index
+
+
+@instrumented
+def load_data_records(cr, module_name, filename, record_ids, mode='update', multi=False, xml_cache=None):
     """
     :param module_name: the name of the module
     :param filename: the path to the filename, relative to the module \
@@ -150,8 +197,8 @@ def load_data_records(cr, module_name, filename, record_ids, mode='update', mult
     :param mode: one of 'init', 'update', 'demo'. Always use 'init' for adding new items \
     from files that are marked with 'noupdate'. Defaults to 'update'.
     :param multi: If false, it will only find the first occurence of the record_id passed. Otherwise, it will find all
+    :param xml_cache: Optional dict to reuse parsed documents between calls
     """
-    from lxml import etree
     from tools import config, xml_import
 
     xml_path = '{}/{}/{}'.format(config['addons_path'], module_name, filename)
@@ -160,49 +207,99 @@ def load_data_records(cr, module_name, filename, record_ids, mode='update', mult
     if not record_ids:
         raise Exception("Maybe you want to run 'load_data' because you don't pass any record id")
     xml_to_import = xml_import(cr, module_name, {}, mode, noupdate=False)
-    doc = etree.parse(xml_path)
+    doc, index = _parse_xml_data(xml_path, xml_cache)
     logger.info('{}: loading file {}'.format(module_name, filename))
     for record_id in record_ids:
         logger.info("{}: Loading record id: {}".format(module_name, record_id))
+        matches = index.get(record_id, [])
         if not multi:
-            rec = doc.findall("//*[@id='{}']".format(record_id))[0]
-            data = doc.findall("//*[@id='{}']/..".format(record_id))[0]
+            if not matches:
+                raise Exception('Record {} not found in {}'.format(record_id, xml_path))
+            matches = matches[:1]
+        for rec, data in matches:
             xml_to_import._tags[rec.tag](cr, rec, data)
+
+_ACCESS_RULES_CACHE = {}
+
+
+def _read_access_rules(module_name, filename):
+    """Read an access rules CSV file and index its rules by model id.
+
+    Parsed files are cached per module and filename, and invalidated when the
+    file mtime changes.
+
+    :param module_name: the name of the module
+    :param filename: the path to the CSV file, relative to the module directory
+    :return: a tuple (header, rows, rules) where rows is the list of rows in \
+    file order and rules is a dict with the model id as key and the list of \
+    the positions of its rows as value.
+    """
+    import csv
+    import tools
+
+    pathname = os.path.join(module_name, filename)
+    fp = tools.file_open(pathname)
+    try:
+        fp_name = getattr(fp, 'name', None)
+        if isinstance(fp_name, string_types) and os.path.exists(fp_name):
+            mtime = os.path.getmtime(fp_name)
         else:
-            recs = doc.findall("//*[@id='{}']".format(record_id))
-            datas = doc.findall("//*[@id='{}']/..".format(record_id))
-            for rec, data in zip(recs, datas):
-                xml_to_import._tags[rec.tag](cr, rec, data)
+            mtime = None
+        key = (module_name, filename)
+        cached = _ACCESS_RULES_CACHE.get(key)
+        if cached and mtime is not None and cached[0] == mtime:
+            return cached[1:]
+        with span('parse {}'.format(pathname), 'load'):
+            reader = csv.reader(fp)
+            header = next(reader)
+            model_columns = [
+                i for i, name in enumerate(header)
+                if name.strip() in ('model_id:id', 'model_id')
+            ]
+            if not model_columns:
+                raise Exception('{} has no model_id:id column'.format(
+                    pathname
+                ))
+            model_column = model_columns[0]
+            rows = []
+            rules = {}
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                rules.setdefault(row[model_column], []).append(len(rows))
+                rows.append(row)
+    finally:
+        fp.close()
+    _ACCESS_RULES_CACHE[key] = (mtime, header, rows, rules)
+    return header, rows, rules
 
+
+@instrumented
 def load_access_rules_from_model_name(cr, module_name, model_ids, filename='security/ir.model.access.csv', mode='init'):
     # Example: load_access_rules_from_model_name(cursor, 'base', ['model_ir_auto_vacuum'], mode='init')
+    # The rules are loaded in the order of the file
+    import csv
     import tools
     if not isinstance(model_ids, (tuple, list)):
         model_ids = [model_ids]
 
     logger.info('%s: loading %s %s' % (module_name, filename, model_ids))
-    _, ext = os.path.splitext(filename)
-    pathname = os.path.join(module_name, filename)
-    fp = tools.file_open(pathname)
-    file_lines = fp.readlines()
-    clean_str = lambda _s: _s.replace('\n', '').replace('\t', '').replace('\r', '')
-    header = clean_str(file_lines.pop(0))
-    header_len = len(header.split(','))
-    rules_lines = [header]
-    for _f_line in file_lines:
-        clean_line = clean_str(_f_line)
-        split_line = clean_line.split(',')
-        if len(split_line) == header_len and split_line[2].replace('"', "") in model_ids:
-            rules_lines.append(clean_line)
-    data_lines = '\n'.join(rules_lines)
-    fp.close()
-    # check
+    header, rows, rules = _read_access_rules(module_name, filename)
+    positions = set()
     for _model in model_ids:
-        if '"{}"'.format(_model) not in data_lines:
-            raise Exception('{} not found in {}'.format(_model, pathname))
-    tools.convert_csv_import(cr, module_name, filename, data_lines, mode=mode)
-
-
+        if _model not in rules:
+            raise Exception('{} not found in {}'.format(
+                _model, os.path.join(module_name, filename)
+            ))
+        positions.update(rules[_model])
+    output = six.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows[i] for i in sorted(positions))
+    tools.convert_csv_import(cr, module_name, filename, output.getvalue(), mode=mode)
+
+
+@instrumented
 def table_exists(cr, table):
     """ Check whether a certain table or view exists """
     cr.execute(
@@ -211,6 +308,7 @@ def table_exists(cr, table):
     return cr.fetchone()[0] == 1
 
 
+@instrumented
 def rename_columns(cr, column_spec):
     """
     Rename table columns. Typically called in the pre script.
@@ -226,6 +324,7 @@ def rename_columns(cr, column_spec):
             cr.execute('ALTER TABLE "%s" RENAME "%s" TO "%s"' % (table, old, new,))
 
 
+@instrumented
 def rename_tables(cr, table_spec):
     """
     Rename tables. Typically called in the pre script.
@@ -238,6 +337,7 @@ def rename_tables(cr, table_spec):
         cr.execute('ALTER TABLE "%s" RENAME TO "%s"' % (old, new,))
 
 
+@instrumented
 def rename_models(cr, model_spec):
     """
     Rename models. Typically called in the pre script.
@@ -255,6 +355,7 @@ def rename_models(cr, model_spec):
                    'WHERE relation = %s', (new, old,))
 
 
+@instrumented
 def drop_columns(cr, column_spec):
     """
     Drop columns but perform an additional check if a column exists.
@@ -275,6 +376,7 @@ def drop_columns(cr, column_spec):
                         table, column)
 
 
+@instrumented
 def add_columns(cr, column_spec, multiple=True):
     """
     Add columns
@@ -312,6 +414,7 @@ def add_columns(cr, column_spec, multiple=True):
 
 
 
+@instrumented
 def add_columns_fk(cr, column_spec):
     """
     Add columns with foreign key constraint
@@ -333,6 +436,7 @@ def add_columns_fk(cr, column_spec):
                        (table, constraint, column, fk_table_name, fk_col, on_delete_act))
 
 
+@instrumented
 def set_stored_function(cr, obj, fields):
     """
     Init newly created stored functions calling the function and storing them
@@ -345,6 +449,7 @@ def set_stored_function(cr, obj, fields):
     :param fields: list of fields
     """
     from datetime import datetime
+    from tqdm import tqdm
     multi_fields = {}
     non_multi_fields = []
     for k in fields:
@@ -399,6 +504,7 @@ def _update_stored_field_function(cr, key, update_query, ss, val):
     if (val is not False) or (type(val) != bool):
         cr.execute(update_query, (ss[1](val), key))
 
+@instrumented
 def delete_model_workflow(cr, model):
     """ 
     Forcefully remove active workflows for obsolete models,
@@ -417,6 +523,7 @@ def delete_model_workflow(cr, model):
         "DELETE FROM wkf WHERE osv = %s", (model,))
 
 
+@instrumented
 def remove_model(cursor, models):
     """
     Removes a list of models and all of its remaining
@@ -515,6 +622,7 @@ def remove_model(cursor, models):
 remove_wizard = remove_model
 
 
+@instrumented
 def clean_old_wizard(cr, old_wizard_name, module):
     """
     :param cr:
@@ -602,7 +710,8 @@ def clean_old_wizard(cr, old_wizard_name, module):
                     cr.execute(sql_del_menu, {'menu_id': value_data['res_id']})
 
 
-def set_defaults(cr, pool, default_spec, force=False):
+@instrumented
+def set_defaults(cr, pool, default_spec, force=False, use_sql=False):
     """
     Set default value. Useful for fields that are newly required. Uses orm, so
     call from the post script.
@@ -610,13 +719,16 @@ def set_defaults(cr, pool, default_spec, force=False):
     :param default_spec: a hash with model names as keys. Values are lists of \
     tuples (field, value). None as a value has a special meaning: it assigns \
     the default value. If this value is provided by a function, the function is \
-    called as the user that created the resource.
+    called as the user that created the resource, once per distinct user.
     :param force: overwrite existing values. To be used for assigning a non- \
     default value (presumably in the case of a new column). The ORM assigns \
     the default value as declared in the model in an earlier stage of the \
     process. Beware of issues with resources loaded from new data that \
     actually do require the model's default, in combination with the post \
     script possible being run multiple times.
+    :param use_sql: write constant values with a single SQL UPDATE instead of \
+    using the ORM. Values are written as they are (no ORM conversions nor \
+    stored functions triggered), so use it only for plain columns.
     """
     from osv import osv
 
@@ -625,49 +737,62 @@ def set_defaults(cr, pool, default_spec, force=False):
                     model, field, len(ids), str(value))
         obj.write(cr, 1, ids, {field: value})
 
+    def sql_write_value(field, value):
+        query = 'UPDATE "{table}" SET "{field}" = %s'.format(
+            table=obj._table, field=field
+        )
+        if not force:
+            query += ' WHERE "{field}" IS NULL'.format(field=field)
+        cr.execute(query, (value,))
+        logger.info("model %s, field %s: setting default value of %d resources to %s",
+                    model, field, cr.rowcount, str(value))
+
     for model in list(default_spec.keys()):
         obj = pool.get(model)
         if not obj:
             raise osv.except_osv("Migration: error setting default, no such model: %s" % model, "")
 
-    for field, value in default_spec[model]:
-        domain = not force and [(field, '=', False)] or []
-        ids = obj.search(cr, 1, domain)
-        if not ids:
-            continue
-        if value is None:
-            # Set the value by calling the _defaults of the object.
-            # Typically used for company_id on various models, and in that
-            # case the result depends on the user associated with the object.
-            # We retrieve create_uid for this purpose and need to call the _defaults
-            # function per resource. Otherwise, write all resources at once.
-            if field in obj._defaults:
-                if not callable(obj._defaults[field]):
-                    write_value(ids, field, obj._defaults[field])
-                else:
-                    # existence users is covered by foreign keys, so this is not needed
-                    # cr.execute("SELECT %s.id, res_users.id FROM %s LEFT OUTER JOIN res_users ON (%s.create_uid = res_users.id) WHERE %s.id IN %s" %
-                    #                     (obj._table, obj._table, obj._table, obj._table, tuple(ids),))
+        for field, value in default_spec[model]:
+            if value is None and field in obj._defaults and not callable(obj._defaults[field]):
+                value = obj._defaults[field]
+            if use_sql and value is not None:
+                sql_write_value(field, value)
+                continue
+            domain = not force and [(field, '=', False)] or []
+            ids = obj.search(cr, 1, domain)
+            if not ids:
+                continue
+            if value is None:
+                # Set the value by calling the _defaults of the object.
+                # Typically used for company_id on various models, and in that
+                # case the result depends on the user associated with the object.
+                # We retrieve create_uid for this purpose and call the _defaults
+                # function once per user, writing all its resources at once.
+                if field in obj._defaults:
                     cr.execute("SELECT id, COALESCE(create_uid, 1) FROM %s " % obj._table + "WHERE id in %s",
                                (tuple(ids),))
                     fetchdict = dict(cr.fetchall())
+                    ids_by_uid = {}
                     for id in ids:
-                        write_value([id], field, obj._defaults[field](obj, cr, fetchdict.get(id, 1), None))
                         if id not in fetchdict:
                             logger.info(
                                 "model %s, field %s, id %d: no create_uid defined or user does not exist anymore",
                                 model, field, id)
+                        ids_by_uid.setdefault(fetchdict.get(id, 1), []).append(id)
+                    for uid, uid_ids in ids_by_uid.items():
+                        write_value(uid_ids, field, obj._defaults[field](obj, cr, uid, None))
+                else:
+                    error = ("OpenUpgrade: error setting default, field %s with "
+                             "None default value not in %s' _defaults" % (
+                                 field, model))
+                    logger.error(error)
+                    # this exeption seems to get lost in a higher up try block
+                    osv.except_osv("OpenUpgrade", error)
             else:
-                error = ("OpenUpgrade: error setting default, field %s with "
-                         "None default value not in %s' _defaults" % (
-                             field, model))
-                logger.error(error)
-                # this exeption seems to get lost in a higher up try block
-                osv.except_osv("OpenUpgrade", error)
-        else:
-            write_value(ids, field, value)
+                write_value(ids, field, value)
 
 
+@instrumented
 def logged_query(cr, query, args=None):
     if args is None:
         args = []
@@ -679,6 +804,7 @@ def logged_query(cr, query, args=None):
     return res
 
 
+@instrumented
 def column_exists(cr, table, column):
     """
     Check whether a certain column exists
@@ -701,6 +827,7 @@ def column_exists(cr, table, column):
     return cr.fetchone()[0] == 1
 
 
+@instrumented
 def change_column_type(cursor, column_spec):
     """
     :param cr: Cursor
@@ -747,6 +874,7 @@ def change_column_type(cursor, column_spec):
     return True
 
 
+@instrumented
 def update_module_names(cr, namespec):
     """
     Deal with changed module names of certified modules
@@ -764,6 +892,7 @@ def update_module_names(cr, namespec):
                  "WHERE module = %s ")
         logged_query(cr, query, (new_name, old_name))
 
+@instrumented
 def update_module_from_model_data(cr, model_spec, target_module):
     """
     Updates the specified models with a new module name
@@ -778,6 +907,7 @@ def update_module_from_model_data(cr, model_spec, target_module):
             "target_module": target_module, "model_list": model_list, "old_module": old_module
         })
 
+@instrumented
 def add_ir_model_fields(cr, columnspec):
     """
     Typically, new columns on ir_model_fields need to be added in a very
@@ -795,6 +925,7 @@ def add_ir_model_fields(cr, columnspec):
         logged_query(cr, query, [])
 
 
+@instrumented
 def install_modules(cursor, *modules):
     """Installs a module.
 
@@ -812,6 +943,7 @@ def install_modules(cursor, *modules):
     return True
 
 
+@instrumented
 def get_foreign_keys(cursor, table):
     """Get all the foreign keys from the given table
 
@@ -846,6 +978,7 @@ def get_foreign_keys(cursor, table):
     return res
 
 
+@instrumented
 def get_installed_modules(cursor):
     cursor.execute(
         "SELECT"
@@ -857,6 +990,7 @@ def get_installed_modules(cursor):
     return [x[0] for x in cursor.fetchall()]
 
 
+@instrumented
 def module_is_installed(cursor, module_name):
     """Test if modules is installed.
 
@@ -873,6 +1007,7 @@ def module_is_installed(cursor, module_name):
     return len(mod_ids) > 0
 
 
+@instrumented
 def load_translation(cursor, lang, name, type, res_id, src, value):
     if res_id is not False and res_id is not None:
         insert_sql = """
@@ -890,10 +1025,214 @@ def load_translation(cursor, lang, name, type, res_id, src, value):
     cursor.execute(insert_sql, {'lang': lang, 'name': name, 'type': type, 'res_id': res_id, 'src': src, 'value': value})
 
 
-class MigrationHelper:
+TRANSLATION_COLUMNS = ('lang', 'name', 'type', 'res_id', 'src', 'value')
+
+
+def _translation_row(translation):
+    """Normalize a translation to a (lang, name, type, res_id, res_xml_id,
+    src, value) tuple.
+
+    Integer (or numeric string) res_id are kept as res_id, otherwise they are
+    taken as an xml id (`module.name`) to be resolved against ir_model_data.
+    As in :func:`load_translation`, False, None and empty res_id mean no
+    resource, while 0 (e.g. from a PO reference `model,field:0`) is kept.
+    False src and value are NULL.
+    """
+    if isinstance(translation, dict):
+        translation = tuple(translation[k] for k in TRANSLATION_COLUMNS)
+    lang, name, type_, res_id, src, value = translation
+    res_xml_id = None
+    if res_id is False or res_id is None or res_id == '':
+        res_id = None
+    elif isinstance(res_id, string_types):
+        if res_id.isdigit():
+            res_id = int(res_id)
+        else:
+            res_xml_id, res_id = res_id, None
+    if src is False:
+        src = None
+    if value is False:
+        value = None
+    return lang, name, type_, res_id, res_xml_id, src, value
+
+
+@instrumented
+def load_translations_bulk(cursor, translations):
+    """Load many translations at once.
+
+    Translations are streamed with COPY (see
+    :meth:`oopgrade.cursor.BatchCursor.copy_rows`) into a temporary staging
+    table and
+    then merged into ir_translation with one upsert for translations with
+    res_id and another one for the ones without it.
+
+    :param cursor: Database cursor
+    :param translations: iterable of dicts with the keys lang, name, type, \
+    res_id, src and value, or tuples with these values in this order. A \
+    res_id like `module.xml_id` is resolved using ir_model_data.
+    :return: number of translations inserted or updated
+    """
+    cursor.execute("DROP TABLE IF EXISTS oopgrade_translation_staging")
+    cursor.execute(
+        "CREATE TEMP TABLE oopgrade_translation_staging ("
+        " seq serial, lang varchar, name varchar, type varchar,"
+        " res_id integer, res_xml_id varchar, src text, value text"
+        ") ON COMMIT DROP"
+    )
+    batch_cursor(cursor).copy_rows(
+        'oopgrade_translation_staging',
+        (_translation_row(t) for t in translations),
+        ['lang', 'name', 'type', 'res_id', 'res_xml_id', 'src', 'value']
+    )
+    cursor.execute(
+        "UPDATE oopgrade_translation_staging s SET res_id = imd.res_id "
+        "FROM ir_model_data imd "
+        "WHERE s.res_xml_id IS NOT NULL "
+        "AND imd.module = split_part(s.res_xml_id, '.', 1) "
+        "AND imd.name = substr(s.res_xml_id, strpos(s.res_xml_id, '.') + 1)"
+    )
+    cursor.execute(
+        "SELECT count(*) FROM oopgrade_translation_staging "
+        "WHERE res_xml_id IS NOT NULL AND res_id IS NULL"
+    )
+    not_found = cursor.fetchone()[0]
+    if not_found:
+        logger.warning(
+            "%s translations skipped: xml id not found", not_found
+        )
+    cursor.execute(
+        "INSERT INTO ir_translation (lang, name, type, res_id, src, value) "
+        "SELECT DISTINCT ON (lang, src, name, type, res_id) "
+        " lang, name, type, res_id, src, value "
+        "FROM oopgrade_translation_staging WHERE res_id IS NOT NULL "
+        "ORDER BY lang, src, name, type, res_id, seq DESC "
+        "ON CONFLICT (lang, src_md5, name, type, res_id) "
+        "WHERE res_id IS NOT NULL DO UPDATE SET value = EXCLUDED.value"
+    )
+    total = cursor.rowcount
+    cursor.execute(
+        "INSERT INTO ir_translation (lang, name, type, res_id, src, value) "
+        "SELECT DISTINCT ON (lang, src, name, type) "
+        " lang, name, type, NULL, src, value "
+        "FROM oopgrade_translation_staging "
+        "WHERE res_id IS NULL AND res_xml_id IS NULL "
+        "ORDER BY lang, src, name, type, seq DESC "
+        "ON CONFLICT (lang, src_md5, name, type) "
+        "WHERE res_id IS NULL DO UPDATE SET value = EXCLUDED.value"
+    )
+    total += cursor.rowcount
+    cursor.execute("DROP TABLE oopgrade_translation_staging")
+    logger.info("%s translations loaded", total)
+    return total
+
+
+def _unquote_po(line):
+    """Unquote a PO string line, resolving its escape sequences."""
+    line = line.strip()[1:-1]
+    replaces = {'n': '\n', 't': '\t', '"': '"', '\\': '\\'}
+    res = []
+    escape = False
+    for char in line:
+        if escape:
+            res.append(replaces.get(char, '\\' + char))
+            escape = False
+        elif char == '\\':
+            escape = True
+        else:
+            res.append(char)
+    return ''.join(res)
+
+
+def _read_po_translations(fp, lang):
+    """Yield translation tuples from an OpenERP PO file.
+
+    Each `#: type:name:res_id` reference of an entry is a translation.
+    """
+    def entries():
+        refs, msgid, msgstr, current = [], [], [], None
+        for line in fp:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#:'):
+                if msgstr:
+                    yield refs, msgid, msgstr
+                    refs, msgid, msgstr, current = [], [], [], None
+                refs.extend(line[2:].split())
+            elif line.startswith('#'):
+                continue
+            elif line.startswith('msgid '):
+                if msgstr:
+                    yield refs, msgid, msgstr
+                    refs, msgstr = [], []
+                msgid, current = [_unquote_po(line[6:])], 'msgid'
+            elif line.startswith('msgstr '):
+                msgstr, current = [_unquote_po(line[7:])], 'msgstr'
+            elif line.startswith('"'):
+                if current == 'msgid':
+                    msgid.append(_unquote_po(line))
+                elif current == 'msgstr':
+                    msgstr.append(_unquote_po(line))
+        if msgstr:
+            yield refs, msgid, msgstr
+
+    for refs, msgid, msgstr in entries():
+        src, value = ''.join(msgid), ''.join(msgstr)
+        if not src or not value:
+            continue
+        for ref in refs:
+            type_, name = ref.split(':', 1)
+            name, res_id = name.rsplit(':', 1)
+            yield lang, name, type_, res_id, src, value
+
+
+def _read_csv_translations(fp, lang):
+    """Yield translation tuples from a CSV file with a header with the
+    columns type, name, res_id, src, value and optionally lang.
+    """
+    import csv
+    reader = csv.reader(fp)
+    header = next(reader)
+    for row in reader:
+        values = dict(zip(header, row))
+        if not values.get('value'):
+            continue
+        yield (
+            values.get('lang', lang), values['name'], values['type'],
+            values['res_id'], values['src'], values['value']
+        )
+
+
+@instrumented
+def load_translations_file(cursor, filename, lang=None):
+    """Load translations from a PO or CSV file in bulk.
+
+    :param cursor: Database cursor
+    :param filename: Path to a `.po` or `.csv` file
+    :param lang: Language code of the translations. Required for PO files \
+    and for CSV files without a lang column.
+    :return: number of translations inserted or updated
+    """
+    _, ext = os.path.splitext(filename)
+    logger.info('Loading translations from %s', filename)
+    open_kwargs = {} if six.PY2 else {'encoding': 'utf-8'}
+    with open(filename, 'r', **open_kwargs) as fp:
+        if ext == '.po':
+            if not lang:
+                raise Exception('Language is required to load {}'.format(filename))
+            translations = _read_po_translations(fp, lang)
+        elif ext == '.csv':
+            translations = _read_csv_translations(fp, lang)
+        else:
+            raise Exception('Unknown translations format: {}'.format(filename))
+        return load_translations_bulk(cursor, translations)
+
+
+class MigrationHelper(object):
     """Helper class for GISCE ERP migrations."""
 
-    def __init__(self, cursor, module_name, logger_name='openerp.migration'):
+    def __init__(self, cursor, module_name, logger_name='openerp.migration',
+                 report=False):
         """Initialize the migration helper.
 
         :param cursor: Database cursor (e.g. psycopg2 cursor).
@@ -902,11 +1241,27 @@ class MigrationHelper:
         :type module_name: str
         :param logger_name: Name of the logger (default: 'openerp.migration').
         :type logger_name: str
+        :param report: Record the steps in `self.report` (a \
+        :class:`oopgrade.report.MigrationReport`). A report can also be \
+        given to add the steps to it (default: False).
+        :type report: bool or MigrationReport
         """
-        self.cursor = cursor
+        self._cursor = cursor
         self.logger = logging.getLogger(logger_name)
         self.module_name = module_name
         self.pool = None
+        self._xml_cache = {}
+        if report is True:
+            report = MigrationReport(module_name)
+        self.report = report or None
+
+    @property
+    def cursor(self):
+        return wrap(self._cursor)
+
+    @cursor.setter
+    def cursor(self, cursor):
+        self._cursor = cursor
 
     def _create_pool(self):
         import pooler
@@ -917,6 +1272,7 @@ class MigrationHelper:
         else:
             self.logger.info("Pool already created")
 
+    @report_step('MigrationHelper.init_model')
     def init_model(self, model_name):
         """Initialize a model’s database table.
 
@@ -949,6 +1305,7 @@ class MigrationHelper:
 
         return self.pool.get(model_name)
 
+    @report_step('MigrationHelper.update_xml')
     def update_xml(self, xml_path, mode='update'):
         """Update an entire XML file.
 
@@ -976,6 +1333,7 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.update_xml_records')
     def update_xml_records(self, xml_path, init_record_ids=None, update_record_ids=None, multi=False):
         """Update specific records in an XML file.
 
@@ -998,12 +1356,18 @@ class MigrationHelper:
         try:
             if init_record_ids:
                 self.logger.info("Initializing specific records in {xml_path}".format(xml_path=xml_path))
-                load_data_records(self.cursor, self.module_name, xml_path, init_record_ids, mode='init', multi=multi)
+                load_data_records(
+                    self.cursor, self.module_name, xml_path, init_record_ids, mode='init', multi=multi,
+                    xml_cache=self._xml_cache
+                )
                 self.logger.info("XML records successfully initialized.")
 
             if update_record_ids:
                 self.logger.info("Updating specific records in {xml_path}".format(xml_path=xml_path))
-                load_data_records(self.cursor, self.module_name, xml_path, update_record_ids, mode='update', multi=multi)
+                load_data_records(
+                    self.cursor, self.module_name, xml_path, update_record_ids, mode='update', multi=multi,
+                    xml_cache=self._xml_cache
+                )
                 self.logger.info("XML records successfully updated.")
         except IOError as err:
             self.logger.error(
@@ -1015,6 +1379,7 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.delete_xml_records')
     def delete_xml_records(self, record_names):
         """Delete the records with `record_names` names from an XML file.
 
@@ -1041,11 +1406,13 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.delete_xml_records_by_ids')
     def delete_xml_records_by_ids(self, record_ids):
         """
         Delete records defined by XML ids: remove their entry from ir_model_data and
         delete the actual record in the corresponding model table.
         """
+        from tqdm import tqdm
         self._create_pool()
 
         for record_id in tqdm(record_ids):
@@ -1087,6 +1454,7 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.update_xml_records_multi')
     def update_xml_records_multi(self, xml_path, init_record_ids=None, update_record_ids=None):
         """Update specific records in an XML file, processing all occurrences of each ID.
 
@@ -1102,6 +1470,7 @@ class MigrationHelper:
         """
         return self.update_xml_records(xml_path, init_record_ids, update_record_ids, multi=True)
 
+    @report_step('MigrationHelper.update_access_csv')
     def update_access_csv(self, model_ids, filename='security/ir.model.access.csv', mode='update'):
         """Update access rules from a CSV file.
 
@@ -1121,6 +1490,7 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.execute_sql')
     def execute_sql(self, sql_query, params=None):
         """Execute a raw SQL query.
 
@@ -1141,6 +1511,7 @@ class MigrationHelper:
 
         return self
 
+    @report_step('MigrationHelper.load_translations')
     def load_translations(self, lang, name, field_type, res_id, source, value):
         """
         Load translations to the database.
@@ -1167,3 +1538,40 @@ class MigrationHelper:
         self.logger.info("Translation successfully loaded")
 
         return self
+
+    @report_step('MigrationHelper.load_translations_bulk')
+    def load_translations_bulk(self, translations):
+        """
+        Load many translations to the database at once.
+
+        :param translations: Iterable of dicts with the keys lang, name, type, res_id, src and value, or tuples
+            with these values in this order.
+        :type translations: iterable
+
+        :return: self
+        :rtype: MigrationHelper
+        """
+        self.logger.info("Loading translations in bulk")
+        total = load_translations_bulk(self.cursor, translations)
+        self.logger.info("{} translations successfully loaded".format(total))
+
+        return self
+
+    @report_step('MigrationHelper.load_translations_file')
+    def load_translations_file(self, filename, lang=None):
+        """
+        Load translations from a PO or CSV file to the database at once.
+
+        :param filename: Path to the `.po` or `.csv` file.
+        :type filename: str
+        :param lang: Language code, required for PO files and CSV files without a lang column.
+        :type lang: str or None
+
+        :return: self
+        :rtype: MigrationHelper
+        """
+        self.logger.info("Loading translations from {}".format(filename))
+        total = load_translations_file(self.cursor, filename, lang=lang)
+        self.logger.info("{} translations successfully loaded".format(total))
+
+        return self
@@ -1,4 +1,86 @@
 # encoding: utf-8
+import json
+
+
+def build_msg(method, kwargs=None, n_retries=0, on_max_retries_method=False,
+              on_max_retries_kwargs=None):
+    """Build the JSON message calling `method` on the subscribers."""
+    return json.dumps({
+        'method': method,
+        'kwargs': kwargs or {},
+        'n_retries': n_retries or 0,
+        'on_max_retries_method': on_max_retries_method or False,
+        'on_max_retries_kwargs': on_max_retries_kwargs or {},
+    })
+
+
+class Publisher(object):
+    """Publish signed messages reusing the signer and a connection pool.
+
+    :param redis_url: Redis URL
+    :param secret: Secret to sign the messages
+    :param connection: Optional Redis client to use instead of creating one \
+    from `redis_url`.
+
+    Example::
+
+        with Publisher(redis_url, secret) as publisher:
+            publisher.publish_many([
+                ('db.reload', build_msg('reload_cache', {'model': m}))
+                for m in models
+            ])
+    """
+
+    def __init__(self, redis_url, secret, connection=None):
+        from itsdangerous import Signer
+        self.signer = Signer(secret)
+        if connection is None:
+            from redis import ConnectionPool, StrictRedis
+            pool = ConnectionPool.from_url(redis_url)
+            connection = StrictRedis(connection_pool=pool)
+        self.redis = connection
+
+    def sign(self, msg):
+        return self.signer.sign(msg)
+
+    def publish(self, channel, msg):
+        """Publish one message.
+
+        :return: Number of subscribers that received the message
+        """
+        return self.redis.publish(channel, self.sign(msg))
+
+    def publish_many(self, messages, batch_size=500):
+        """Publish many messages through a pipeline, sending `batch_size`
+        messages per round trip.
+
+        :param messages: iterable of (channel, msg)
+        :return: list with the number of subscribers that received each message
+        """
+        sent_to = []
+        pipe = self.redis.pipeline(transaction=False)
+        pending = 0
+        for channel, msg in messages:
+            pipe.publish(channel, self.sign(msg))
+            pending += 1
+            if pending >= batch_size:
+                sent_to.extend(pipe.execute())
+                pending = 0
+        if pending:
+            sent_to.extend(pipe.execute())
+        return sent_to
+
+    def close(self):
+        """Disconnect the pooled connections."""
+        self.redis.connection_pool.disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 def send_msg(redis_url, secret, channel, msg):
     from itsdangerous import Signer
     from redis import from_url
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Per-step report of migration helpers.
+
+Every :class:`oopgrade.oopgrade.MigrationHelper` step is recorded in its
+`report`, when the helper is created with `report=True`, with the start
+time, the elapsed time, the number of queries and the rows affected by data
+modifying statements.
+
+Example::
+
+    helper = MigrationHelper(cursor, 'module_name', report=True)
+    helper.init_model('res.partner').update_xml('partner_view.xml')
+    helper.report.write_json('/tmp/migration_report.json')
+    helper.report.write_prometheus('/var/lib/node_exporter/migration.prom')
+"""
+from __future__ import absolute_import
+import functools
+import json
+import os
+from datetime import datetime
+
+import six
+
+from oopgrade import instrument
+
+__all__ = [
+    'MigrationReport',
+    'report_step',
+]
+
+
+def _escape_label(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+class MigrationReport(object):
+    """Report of the steps executed in a migration.
+
+    :param module: Module name of the migration
+    """
+
+    def __init__(self, module=None):
+        self.module = module
+        self.steps = []
+        self.memory = []
+
+    def add_step(self, step, target=None, elapsed=0.0, queries=0, rows=0,
+                 status='ok', start=None, **extra):
+        """Add a step to the report.
+
+        :param step: Step name (e.g. 'MigrationHelper.init_model')
+        :param target: What the step works on (a model, a file, ...)
+        :param elapsed: Elapsed time in seconds
+        :param queries: Number of queries executed
+        :param rows: Number of rows affected
+        :param status: 'ok' or 'error'
+        :param start: When the step started, a datetime or an ISO 8601 \
+        string. Now if None.
+        :return: the step as a dict
+        """
+        if start is None:
+            start = datetime.now()
+        if isinstance(start, datetime):
+            start = start.isoformat()
+        step = dict(
+            module=self.module, step=step, target=target,
+            start=start, elapsed=elapsed,
+            queries=queries, rows=rows, status=status, **extra
+        )
+        self.steps.append(step)
+        return step
+
+    @property
+    def elapsed(self):
+        return sum(s['elapsed'] for s in self.steps)
+
+    def to_dict(self):
+        res = {
+            'module': self.module,
+            'elapsed': self.elapsed,
+            'queries': sum(s['queries'] for s in self.steps),
+            'rows': sum(s['rows'] for s in self.steps),
+            'steps': [s.copy() for s in self.steps],
+        }
+        if self.memory:
+            res['memory'] = [m.copy() for m in self.memory]
+        return res
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def write_json(self, path):
+        """Write the report as JSON to `path`."""
+        with open(path, 'w') as report_file:
+            report_file.write(self.to_json(indent=2, sort_keys=True))
+
+    def to_prometheus(self, prefix='oopgrade_migration'):
+        """Get the report in the Prometheus text exposition format.
+
+        Steps with the same name and target are added up.
+        """
+        metrics = [
+            ('step_duration_seconds', 'elapsed', 'Elapsed time of the step'),
+            ('step_queries', 'queries', 'Queries executed by the step'),
+            ('step_rows', 'rows', 'Rows affected by the step'),
+        ]
+        totals = {}
+        for step in self.steps:
+            key = (step['step'], step['target'] or '')
+            total = totals.setdefault(key, dict.fromkeys(
+                [m[1] for m in metrics], 0
+            ))
+            for _, attr, _ in metrics:
+                total[attr] += step[attr]
+        lines = []
+        for name, attr, help_text in metrics:
+            metric = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(metric, help_text))
+            lines.append('# TYPE {} gauge'.format(metric))
+            for (step, target), total in sorted(totals.items()):
+                lines.append('{}{{module="{}",step="{}",target="{}"}} {}'.format(
+                    metric, _escape_label(self.module or ''),
+                    _escape_label(step), _escape_label(target), total[attr]
+                ))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='oopgrade_migration'):
+        """Write the report to a Prometheus node exporter textfile.
+
+        The file is written to a temporary file and renamed, so the collector
+        never reads a partial file.
+        """
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as prom_file:
+            prom_file.write(self.to_prometheus(prefix))
+        os.rename(tmp_path, path)
+
+
+def report_step(name):
+    """Decorator for MigrationHelper methods.
+
+    The method is instrumented as `name` and, if `self.report` is not None
+    and it is not called from another step, recorded in the report with its
+    first argument as target. Only steps recorded in a report collect their
+    statements, so the cursor is not wrapped otherwise.
+    """
+    def decorator(func):
+        func = instrument.instrumented(func, name=name)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            report = getattr(self, 'report', None)
+            if report is None or getattr(self, '_step_depth', 0):
+                return func(self, *args, **kwargs)
+            target = args[0] if args else None
+            if target is not None and not isinstance(target, six.string_types):
+                target = repr(target)
+            if target is not None and len(target) > 100:
+                target = target[:97] + '...'
+            status = 'error'
+            stats = instrument.QueryStats()
+            self._step_depth = 1
+            started = datetime.now()
+            start = instrument.timer()
+            try:
+                with instrument.collect(stats):
+                    res = func(self, *args, **kwargs)
+                status = 'ok'
+                return res
+            finally:
+                self._step_depth = 0
+                report.add_step(
+                    name, target=target, elapsed=instrument.timer() - start,
+                    queries=stats.total_calls,
+                    rows=stats.dml_rows,
+                    status=status, start=started
+                )
+        return wrapper
+    return decorator
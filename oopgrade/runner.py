@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Run a migration on many databases concurrently.
+
+Each database is migrated in its own transaction by a worker of a bounded
+process pool, with one connection per worker.
+
+Example::
+
+    from oopgrade.runner import run_migration
+
+    conn_params = {'user': 'erp', 'host': 'localhost'}
+    for res in run_migration('migrations/post-0001.py', ['db1', 'db2'], conn_params):
+        print(res['database'], res['status'], res['elapsed'])
+"""
+from __future__ import absolute_import
+import fnmatch
+import importlib
+import logging
+import os
+import time
+import traceback
+
+logger = logging.getLogger('openerp.oopgrade')
+
+__all__ = [
+    'list_databases',
+    'load_migration',
+    'run_migration',
+]
+
+
+def list_databases(conn_params, patterns=None):
+    """List the databases of a server.
+
+    :param conn_params: psycopg2.connect keyword arguments (without dbname)
+    :param patterns: list of shell-style patterns (e.g. 'tenant_*') to \
+    filter the databases. All non template databases if None.
+    :return: sorted list of database names
+    """
+    import psycopg2
+    conn = psycopg2.connect(dbname='postgres', **conn_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT datname FROM pg_database "
+                "WHERE NOT datistemplate AND datallowconn"
+            )
+            databases = [x[0] for x in cursor.fetchall()]
+    finally:
+        conn.close()
+    if patterns:
+        databases = [
+            db for db in databases
+            if any(fnmatch.fnmatchcase(db, p) for p in patterns)
+        ]
+    return sorted(databases)
+
+
+def _load_source(name, path):
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:
+        import imp
+        return imp.load_source(name, path)
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_migration(target):
+    """Load a migration callable.
+
+    :param target: `package.module:function` or the path of a migration \
+    script defining a `migrate(cursor, installed_version)` function.
+    :return: the callable, called as `func(cursor, installed_version)`
+    """
+    if os.path.isfile(target):
+        name = os.path.splitext(os.path.basename(target))[0].replace('-', '_')
+        module = _load_source('oopgrade_migration_{}'.format(name), target)
+        func_name = 'migrate'
+    else:
+        if ':' not in target:
+            raise ValueError(
+                'Migration {} is not a file nor a module:function'.format(target)
+            )
+        module_name, func_name = target.split(':', 1)
+        module = importlib.import_module(module_name)
+    func = getattr(module, func_name, None)
+    if not callable(func):
+        raise ValueError('{} has no callable {}'.format(target, func_name))
+    return func
+
+
+def _run_database(task):
+    """Migrate one database. Runs in a worker process."""
+    import psycopg2
+    target, database, conn_params, installed_version = task
+    start = time.time()
+    res = {
+        'database': database, 'status': 'ok', 'error': None, 'traceback': None
+    }
+    try:
+        migrate = load_migration(target)
+        conn = psycopg2.connect(dbname=database, **conn_params)
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    migrate(cursor, installed_version)
+        finally:
+            conn.close()
+    except Exception as err:
+        res['status'] = 'error'
+        res['error'] = '{}: {}'.format(type(err).__name__, err)
+        res['traceback'] = traceback.format_exc()
+    res['elapsed'] = time.time() - start
+    return res
+
+
+def run_migration(target, databases, conn_params, processes=4, installed_version=None):
+    """Run a migration on many databases concurrently.
+
+    Every database is migrated in a transaction, committed if the migration
+    succeeds and rolled back otherwise.
+
+    :param target: Migration, see :func:`load_migration`
+    :param databases: list of database names
+    :param conn_params: psycopg2.connect keyword arguments (without dbname)
+    :param processes: Maximum number of databases migrated at the same \
+    time. With 1 or less they are migrated in this process one after another.
+    :param installed_version: Passed to the migration callable
+    :return: iterator of dicts with the keys database, status ('ok' or \
+    'error'), elapsed, error and traceback, in completion order.
+    """
+    # Fail early if the migration can not be loaded
+    load_migration(target)
+    tasks = [
+        (target, database, conn_params, installed_version)
+        for database in databases
+    ]
+    if processes <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _run_database(task)
+        return
+    from multiprocessing import Pool
+    pool = Pool(min(processes, len(tasks)))
+    try:
+        for res in pool.imap_unordered(_run_database, tasks):
+            yield res
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Chrome trace-event export of migration runs.
+
+The generated JSON file can be opened with Perfetto (https://ui.perfetto.dev)
+or `chrome://tracing`. Helper calls, SQL statements and XML/CSV loads are
+nested by time inside the spans that contain them.
+
+Example::
+
+    from oopgrade.trace import Tracer
+
+    with Tracer() as tracer:
+        with tracer.span('migrate module_name'):
+            helper = MigrationHelper(cursor, 'module_name')
+            helper.init_model('res.partner')
+    tracer.write('/tmp/migration.trace.json')
+"""
+from __future__ import absolute_import
+import json
+import os
+import threading
+
+from oopgrade import instrument
+
+__all__ = [
+    'Tracer',
+]
+
+
+class Tracer(object):
+    """Instrumentation listener recording trace events.
+
+    :param max_query_length: SQL queries are truncated to this length in the \
+    span names (the full query is kept in the span args).
+    """
+
+    def __init__(self, max_query_length=80):
+        self.max_query_length = max_query_length
+        self.events = []
+        self.origin = instrument.timer()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def on_span(self, name, category, start, duration, args):
+        args = dict(args)
+        if category == 'sql':
+            args['query'] = name
+            if len(name) > self.max_query_length:
+                name = name[:self.max_query_length - 3] + '...'
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': duration * 1e6,
+            'pid': self.pid,
+            'tid': threading.current_thread().ident,
+            'args': args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def start(self):
+        """Start recording events."""
+        instrument.add_listener(self)
+        return self
+
+    def stop(self):
+        """Stop recording events."""
+        instrument.remove_listener(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def span(self, name, category='migration', **args):
+        """Context manager recording a named span, e.g. a whole migration."""
+        return instrument.span(name, category, **args)
+
+    def to_dict(self):
+        # Parents first when they start at the same time as their children
+        events = sorted(self.events, key=lambda e: (e['ts'], -e['dur']))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        """Write the trace events as JSON to `path`."""
+        with open(path, 'w') as trace_file:
+            json.dump(self.to_dict(), trace_file)
@@ -1,18 +1,267 @@
 from ast import literal_eval
+import hashlib
+import json
 import logging
 import os
+import re
 import sys
 import subprocess
 
 __all__ = [
+    'AddonsGraph',
+    'ManifestIndex',
+    'MigrationIndex',
+    'RequirementsState',
     'get_dependencies',
     'install_requirements',
+    'collect_requirements',
+    'merge_requirements',
+    'pip_install_requirements_files',
 ]
 
 logger = logging.getLogger(__name__)
 
 
-def get_dependencies(module, addons_path=None, deps=None):
+def file_hash(path):
+    """Get the sha256 hex digest of a file content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def requirements_hash(path):
+    """Get the sha256 hex digest of a requirements file and of the files it
+    includes with `-r` or `-c`, recursively. A missing include is part of the
+    digest too, so creating it changes the digest.
+    """
+    digest = hashlib.sha256()
+    pending = [os.path.abspath(path)]
+    seen = set()
+    while pending:
+        current = pending.pop(0)
+        if current in seen:
+            continue
+        seen.add(current)
+        digest.update(current.encode('utf-8') + b'\0')
+        if not os.path.isfile(current):
+            digest.update(b'missing\0')
+            continue
+        digest.update(file_hash(current).encode('ascii') + b'\0')
+        base_dir = os.path.dirname(current)
+        with open(current, 'r') as req_file:
+            for line in _requirements_lines(req_file):
+                if not line.startswith('-'):
+                    continue
+                option, value = _split_option(line)
+                if option in _file_options and value:
+                    pending.append(os.path.join(base_dir, value))
+    return digest.hexdigest()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def read_module_info(module_path):
+    """Read the information of a module needed by dependency-aware tools.
+
+    :param module_path: Path of the module
+    :return: dict with the keys depends, requirements (path of the \
+    requirements.txt file or None) and requirements_hash.
+    """
+    with open(os.path.join(module_path, '__terp__.py'), 'r') as terp_file:
+        terp = literal_eval(terp_file.read())
+    req = os.path.join(module_path, 'requirements.txt')
+    has_req = os.path.exists(req)
+    return {
+        'depends': list(terp.get('depends', [])),
+        'requirements': req if has_req else None,
+        'requirements_hash': file_hash(req) if has_req else None,
+    }
+
+
+class ManifestIndex(object):
+    """On-disk index of the module manifests of an addons path
+
+    Entries are keyed by module path and only re-read when the mtime of the
+    `__terp__.py` or the `requirements.txt` file changes.
+
+    :param path: Path of the JSON index file
+    """
+
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as index_file:
+                data = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == self.version:
+            self.entries = data.get('modules', {})
+
+    def save(self):
+        """Write the index if it has changed."""
+        if not self.dirty:
+            return
+        _write_json(
+            self.path, {'version': self.version, 'modules': self.entries}
+        )
+        self.dirty = False
+
+    def get(self, module_path):
+        """Get the information of a module, reading it only if has changed.
+
+        :param module_path: Path of the module
+        :return: dict as returned by :func:`read_module_info`
+        """
+        terp_mtime = _mtime(os.path.join(module_path, '__terp__.py'))
+        req_mtime = _mtime(os.path.join(module_path, 'requirements.txt'))
+        entry = self.entries.get(module_path)
+        if (entry and entry['terp_mtime'] == terp_mtime
+                and entry['requirements_mtime'] == req_mtime):
+            return entry['info']
+        info = read_module_info(module_path)
+        self.entries[module_path] = {
+            'terp_mtime': terp_mtime,
+            'requirements_mtime': req_mtime,
+            'info': info,
+        }
+        self.dirty = True
+        return info
+
+
+def cache_path(name, key):
+    """Get the path of an oopgrade cache file in the user cache directory.
+
+    :param name: Prefix of the file name
+    :param key: String identifying the cache (e.g. a path)
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'oopgrade', '{}-{}.json'.format(name, key))
+
+
+def default_index_path(addons_path):
+    """Get the default manifest index path for an addons path, in the user
+    cache directory.
+    """
+    return cache_path('manifests', os.path.abspath(addons_path))
+
+
+def _write_json(path, data):
+    """Write data as JSON to a temporary file renamed to `path`, so readers
+    never see a partial file.
+    """
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as json_file:
+        json.dump(data, json_file)
+    os.rename(tmp_path, path)
+
+
+class AddonsGraph(object):
+    """Dependency graph of the modules in an addons path
+
+    Each `__terp__.py` file is parsed only once, and if an index is used only
+    when it has changed since the last run.
+
+    :param addons_path: Path to find the modules
+    :param index: Optional :class:`ManifestIndex` to share between runs
+    """
+
+    def __init__(self, addons_path, index=None):
+        self.addons_path = addons_path
+        self.index = index
+        self.infos = {}
+
+    def module_path(self, module):
+        pj = os.path.join
+        module_path = pj(self.addons_path, module)
+        if not os.path.exists(module_path):
+            raise Exception('Module \'{}\' not found in {}'.format(
+                module, self.addons_path
+            ))
+        if not os.path.exists(pj(module_path, '__terp__.py')):
+            raise Exception(
+                'Module {} is not a valid module. Missing __terp__.py file'.format(
+                    module
+                )
+            )
+        return module_path
+
+    def module_info(self, module):
+        """Get the information of a module.
+
+        :param module: Module name
+        :return: dict as returned by :func:`read_module_info`
+        """
+        if module not in self.infos:
+            module_path = self.module_path(module)
+            if self.index is not None:
+                info = self.index.get(module_path)
+            else:
+                info = read_module_info(module_path)
+            self.infos[module] = info
+        return self.infos[module]
+
+    def depends(self, module):
+        """Get the direct dependencies of a module."""
+        return self.module_info(module)['depends']
+
+    def requirements(self, module):
+        """Get the path of the requirements.txt of a module or None."""
+        return self.module_info(module)['requirements']
+
+    def save(self):
+        """Save the index, if any."""
+        if self.index is not None:
+            self.index.save()
+
+    def dependencies(self, module):
+        """Get all the dependencies of a module.
+
+        :param module: Module name
+        :return: list of modules, every module after its own dependencies. \
+        The module itself is not included.
+        """
+        ordered = []
+        done = set()
+        visiting = set([module])
+        stack = [(module, iter(self.depends(module)))]
+        while stack:
+            current, pending = stack[-1]
+            for dep in pending:
+                if dep in done or dep in visiting:
+                    continue
+                visiting.add(dep)
+                stack.append((dep, iter(self.depends(dep))))
+                break
+            else:
+                stack.pop()
+                visiting.discard(current)
+                done.add(current)
+                if current != module:
+                    ordered.append(current)
+        return ordered
+
+
+def get_dependencies(module, addons_path=None, deps=None, graph=None):
     """Get all the dependencies of a module without database
 
     Using `__terp__.py` files and is used to check requirements.txt in the
@@ -20,35 +269,265 @@ def get_dependencies(module, addons_path=None, deps=None):
 
     :param module: Module to find the dependencies
     :param addons_path: Path to find the modules
-    :return: a listt of dependencies.
-    """
-    if deps is None:
-        deps = []
-    pj = os.path.join
-    module_path = pj(addons_path, module)
-    if not os.path.exists(module_path):
-        raise Exception('Module \'{}\' not found in {}'.format(
-            module, addons_path
-        ))
-    terp_path = pj(module_path, '__terp__.py')
-    if not os.path.exists(terp_path):
-        raise Exception(
-            'Module {} is not a valid module. Missing __terp__.py file'.format(
-                module
-            )
+    :param deps: Already known dependencies to include in the result
+    :param graph: :class:`AddonsGraph` to reuse parsed manifests between calls
+    :return: a list of dependencies, every module after its own dependencies.
+    """
+    if graph is None:
+        graph = AddonsGraph(addons_path)
+    res = graph.dependencies(module)
+    if deps:
+        known = set(res)
+        res = [dep for dep in deps if dep not in known] + res
+    return res
+
+
+MIGRATION_SCRIPT_RE = re.compile(r'^(pre|post)-.*\.py$')
+
+
+def normalize_version(version):
+    """Get the semantic version of a module version.
+
+    OpenERP versions prefix the module version with the server series
+    (`5.0.23.1.0` is the module version `23.1.0`).
+    """
+    parts = version.split('.')
+    if len(parts) == 5:
+        return '.'.join(parts[2:])
+    return version
+
+
+class MigrationIndex(object):
+    """Index of the migration scripts of the modules in an addons path
+
+    Scripts are found in `<module>/migrations/<version>/pre-*.py` and
+    `post-*.py`. The index of a module is only rebuilt when the mtime of its
+    `migrations` directory or of one of its version directories changes.
+
+    :param addons_path: Path to find the modules
+    :param path: Optional path of the JSON index file to share between runs
+    """
+
+    version = 1
+
+    def __init__(self, addons_path, path=None):
+        self.addons_path = addons_path
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r') as index_file:
+                data = json.load(index_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == self.version:
+            self.entries = data.get('modules', {})
+
+    def save(self):
+        """Write the index if it has changed."""
+        if not self.path or not self.dirty:
+            return
+        _write_json(
+            self.path, {'version': self.version, 'modules': self.entries}
         )
-    with open(terp_path, 'r') as terp_file:
-        terp = literal_eval(terp_file.read())
+        self.dirty = False
 
-    for dep in terp['depends']:
-        if dep not in deps:
-            deps.append(dep)
-            deps += get_dependencies(dep, addons_path, deps)
+    def _scan(self, module):
+        from oopgrade.version import version_key
+        migrations_path = os.path.join(self.addons_path, module, 'migrations')
+        entry = {'mtime': _mtime(migrations_path), 'versions': {}}
+        if entry['mtime'] is None:
+            return entry
+        for version in os.listdir(migrations_path):
+            version_path = os.path.join(migrations_path, version)
+            if not os.path.isdir(version_path):
+                continue
+            try:
+                version_key(normalize_version(version))
+            except ValueError:
+                logger.warning(
+                    'Ignoring migrations of %s with invalid version %s',
+                    module, version
+                )
+                continue
+            scripts = {'mtime': _mtime(version_path), 'pre': [], 'post': []}
+            for name in sorted(os.listdir(version_path)):
+                match = MIGRATION_SCRIPT_RE.match(name)
+                if match:
+                    scripts[match.group(1)].append(name)
+            entry['versions'][version] = scripts
+        return entry
 
-    return list(set(deps))
+    def module_entry(self, module):
+        """Get the migration versions of a module, scanning them only if they
+        have changed.
 
+        :return: dict with the keys mtime and versions ({version: {'mtime', \
+        'pre', 'post'}})
+        """
+        migrations_path = os.path.join(self.addons_path, module, 'migrations')
+        entry = self.entries.get(module)
+        if entry is not None and entry['mtime'] == _mtime(migrations_path):
+            if all(
+                    _mtime(os.path.join(migrations_path, version)) == scripts['mtime']
+                    for version, scripts in entry['versions'].items()):
+                return entry
+        entry = self._scan(module)
+        self.entries[module] = entry
+        self.dirty = True
+        return entry
 
-def pip_install_requirements(requirements_path, silent=False):
+    def build(self):
+        """Index all the modules of the addons path.
+
+        :return: sorted list of the modules with migration versions
+        """
+        modules = []
+        for module in sorted(os.listdir(self.addons_path)):
+            if not os.path.exists(os.path.join(self.addons_path, module, '__terp__.py')):
+                continue
+            if self.module_entry(module)['versions']:
+                modules.append(module)
+        return modules
+
+    def versions(self, module):
+        """Get the migration versions of a module in upgrade order."""
+        from oopgrade.version import version_key
+        return sorted(
+            self.module_entry(module)['versions'],
+            key=lambda v: version_key(normalize_version(v))
+        )
+
+    def scripts(self, module, installed_version=None, target_version=None, stage=None):
+        """Get the migration scripts of a module to run in an upgrade.
+
+        A version applies when `installed_version < version <= target_version`
+        as in the OpenERP migration manager.
+
+        :param module: Module name
+        :param installed_version: Installed version (None for all)
+        :param target_version: Target version (None for all)
+        :param stage: 'pre', 'post' or None for both, pre scripts first
+        :return: list of dicts with the keys module, version, stage, name and \
+        path in running order.
+        """
+        from oopgrade.version import version_key
+        low = high = None
+        if installed_version:
+            low = version_key(normalize_version(installed_version))
+        if target_version:
+            high = version_key(normalize_version(target_version))
+        entry = self.module_entry(module)
+        versions = []
+        for version in self.versions(module):
+            key = version_key(normalize_version(version))
+            if (low is None or key > low) and (high is None or key <= high):
+                versions.append(version)
+        res = []
+        for script_stage in (stage, ) if stage else ('pre', 'post'):
+            for version in versions:
+                for name in entry['versions'][version][script_stage]:
+                    res.append({
+                        'module': module,
+                        'version': version,
+                        'stage': script_stage,
+                        'name': name,
+                        'path': os.path.join(
+                            self.addons_path, module, 'migrations', version, name
+                        ),
+                    })
+        return res
+
+
+def default_migration_index_path(addons_path):
+    """Get the default migration index path for an addons path, in the user
+    cache directory.
+    """
+    return cache_path('migrations', os.path.abspath(addons_path))
+
+
+def interpreter_key():
+    """Get a string identifying the running Python interpreter."""
+    return '{} {}'.format(
+        sys.executable, '.'.join(str(v) for v in sys.version_info[:3])
+    )
+
+
+class RequirementsState(object):
+    """Local state of the installed requirements files
+
+    Keeps the content hash of every requirements file (and the files it
+    includes with `-r` or `-c`) successfully installed with the current
+    interpreter, to skip it while it does not change. If the interpreter
+    changes all the files are installed again.
+
+    :param path: Path of the JSON state file
+    """
+
+    version = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.interpreter = interpreter_key()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as state_file:
+                data = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return
+        if (data.get('version') == self.version
+                and data.get('interpreter') == self.interpreter):
+            self.files = data.get('files', {})
+
+    def save(self):
+        _write_json(self.path, {
+            'version': self.version, 'interpreter': self.interpreter,
+            'files': self.files
+        })
+
+    def is_installed(self, requirements_path, digest=None):
+        """Check if a requirements file is installed and unchanged.
+
+        :param requirements_path: Path of the requirements file
+        :param digest: :func:`requirements_hash` of the file, computed if None
+        """
+        key = os.path.abspath(requirements_path)
+        if key not in self.files:
+            return False
+        if digest is None:
+            digest = requirements_hash(requirements_path)
+        return self.files[key] == digest
+
+    def mark_installed(self, requirements_path, digest=None):
+        if digest is None:
+            digest = requirements_hash(requirements_path)
+        self.files[os.path.abspath(requirements_path)] = digest
+
+
+def default_state_path():
+    """Get the default requirements state path for the running interpreter,
+    in the user cache directory.
+    """
+    return cache_path('requirements', sys.executable)
+
+
+def pip_install_requirements(requirements_path, silent=False, state=None, force=False):
+    """Install a requirements file with pip.
+
+    :param requirements_path: Path of the requirements file
+    :param silent: Hide pip output
+    :param state: Optional :class:`RequirementsState` to skip the file if it \
+    has not changed since its last install.
+    :param force: Install even if the file has not changed
+    """
     subprocess_kwargs = {}
     if silent:
         FNULL = open(os.devnull, 'w')
@@ -58,24 +537,255 @@ def pip_install_requirements(requirements_path, silent=False):
         }
     pip = os.path.join(sys.prefix, 'bin', 'pip')
     if os.path.exists(requirements_path):
+        if state is not None and not force and state.is_installed(requirements_path):
+            logger.info('Requirements file %s not changed. Skipping.', requirements_path)
+            return
         logger.info('Requirements file %s found. Installing...', requirements_path)
         subprocess.check_call([pip, "install", "-r", requirements_path], **subprocess_kwargs)
+        if state is not None:
+            state.mark_installed(requirements_path)
 
 
-def install_requirements(module, addons_path, silent=False, done=None):
+def install_requirements(module, addons_path, silent=False, done=None, graph=None,
+                         state=None, force=False):
     """Install module requirements and its dependecies
     """
     if done is None:
         done = []
+    if graph is None:
+        graph = AddonsGraph(addons_path)
     pip = os.path.join(sys.prefix, 'bin', 'pip')
     if os.path.exists(pip):
-        modules_requirements = get_dependencies(module, addons_path)
+        modules_requirements = get_dependencies(module, graph=graph)
         modules_requirements.append(module)
         for module_requirements in modules_requirements:
             if module_requirements in done:
                 continue
-            addons_path_module = os.path.join(addons_path, module_requirements)
-            req = os.path.join(addons_path_module, 'requirements.txt')
-            pip_install_requirements(req, silent)
+            req = graph.requirements(module_requirements)
+            if req is not None:
+                pip_install_requirements(req, silent, state=state, force=force)
         return modules_requirements
     return [module]
+
+
+_requirement_re = re.compile(
+    r'^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?P<extras>\[[^\]]*\])?\s*'
+    r'(?P<spec>[<>=!~][^;@]*)?$'
+)
+_file_options = ('-r', '--requirement', '-c', '--constraint')
+_editable_options = ('-e', '--editable')
+_url_re = re.compile(r'^[A-Za-z][A-Za-z0-9.+-]*(://|\+)')
+_archive_extensions = ('.whl', '.zip', '.tar.gz', '.tgz', '.tar.bz2')
+_long_option_re = re.compile(r'^(--[A-Za-z][\w-]*)(?:\s*=\s*|\s+|$)(.*)$')
+_requirement_options_re = re.compile(r'\s--?[A-Za-z]')
+
+
+def _requirements_lines(req_file):
+    """Yield the lines of a requirements file without comments, joining
+    the lines continued with a backslash.
+    """
+    continued = ''
+    for line in req_file:
+        line = line.rstrip('\r\n')
+        if line.endswith('\\'):
+            continued += line[:-1] + ' '
+            continue
+        line = re.sub(r'(^|\s)#.*$', '', continued + line).strip()
+        continued = ''
+        if line:
+            yield line
+    line = re.sub(r'(^|\s)#.*$', '', continued).strip()
+    if line:
+        yield line
+
+
+def _split_option(line):
+    """Split an option line of a requirements file in (option, value).
+
+    The `--option value`, `--option=value`, `-o value` and `-ovalue`
+    spellings are supported.
+    """
+    if line.startswith('--'):
+        match = _long_option_re.match(line)
+        if match:
+            return match.group(1), match.group(2).strip()
+        return line, ''
+    return line[:2], line[2:].strip()
+
+
+def _split_requirement_options(line):
+    """Split a requirement line in the requirement and its per-requirement
+    options (e.g. `--hash=sha256:...`), normalizing the spaces of the
+    options.
+    """
+    match = _requirement_options_re.search(line)
+    if not match:
+        return line, ''
+    return line[:match.start()].strip(), ' '.join(line[match.start():].split())
+
+
+def _is_local_path(value):
+    """Whether a requirement (without option) is a local path."""
+    value = re.split(r'[\[;]', value, 1)[0].strip()
+    if not value or _url_re.match(value) or ' @ ' in value:
+        return False
+    return (
+        value.startswith('.') or '/' in value or os.sep in value or
+        value.endswith(_archive_extensions)
+    )
+
+
+def _absolute_path(value, base_dir):
+    """Make a relative path absolute from `base_dir`, keeping the extras
+    and environment markers after it.
+    """
+    match = re.search(r'\s*[\[;]', value)
+    index = match.start() if match else len(value)
+    path, rest = value[:index].strip(), value[index:]
+    if _url_re.match(path) or os.path.isabs(path):
+        return value
+    return os.path.normpath(os.path.join(base_dir, path)) + rest
+
+
+def merge_requirements(requirements_paths):
+    """Merge requirements files in a single list of requirements.
+
+    Repeated lines are removed and the version specifiers of the same project
+    are joined, so pip resolves all of them at once. Lines with environment
+    markers, URLs or per-requirement options (e.g. `--hash`) are kept as they
+    are, and the paths of nested `-r` and `-c` files, editable (`-e`) and
+    local path requirements are made absolute from the directory of the file
+    they come from. Lines continued with a backslash are joined.
+
+    :param requirements_paths: list of requirements files paths
+    :return: list of requirement lines
+    """
+    lines = []
+    projects = {}
+    seen = set()
+    for requirements_path in requirements_paths:
+        base_dir = os.path.dirname(os.path.abspath(requirements_path))
+        with open(requirements_path, 'r') as req_file:
+            for line in _requirements_lines(req_file):
+                options = ''
+                if not line.startswith('-'):
+                    line, options = _split_requirement_options(line)
+                if line.startswith('-'):
+                    option, value = _split_option(line)
+                    if (option in _file_options or
+                            option in _editable_options) and value:
+                        line = '{} {}'.format(
+                            option, _absolute_path(value, base_dir)
+                        )
+                elif _is_local_path(line):
+                    line = _absolute_path(line, base_dir)
+                elif not options and _requirement_re.match(line):
+                    match = _requirement_re.match(line)
+                    name = re.sub(r'[-_.]+', '-', match.group('name')).lower()
+                    if name not in projects:
+                        projects[name] = {
+                            'name': match.group('name'), 'extras': [],
+                            'specs': []
+                        }
+                        lines.append(projects[name])
+                    project = projects[name]
+                    extras = (match.group('extras') or '').strip('[]')
+                    for extra in extras.split(','):
+                        extra = extra.strip()
+                        if extra and extra not in project['extras']:
+                            project['extras'].append(extra)
+                    for spec in (match.group('spec') or '').split(','):
+                        spec = spec.replace(' ', '')
+                        if spec and spec not in project['specs']:
+                            project['specs'].append(spec)
+                    continue
+                if options:
+                    line = '{} {}'.format(line, options)
+                if line not in seen:
+                    seen.add(line)
+                    lines.append(line)
+    res = []
+    for line in lines:
+        if isinstance(line, dict):
+            extras = ''
+            if line['extras']:
+                extras = '[{}]'.format(','.join(line['extras']))
+            line = '{}{}{}'.format(
+                line['name'], extras, ','.join(line['specs'])
+            )
+        res.append(line)
+    return res
+
+
+def collect_requirements(modules, graph):
+    """Get the requirements files of some modules and all their dependencies.
+
+    :param modules: list of module names
+    :param graph: :class:`AddonsGraph`
+    :return: list of requirements files paths, dependencies first
+    """
+    res = []
+    done = set()
+    for module in modules:
+        for dep in graph.dependencies(module) + [module]:
+            if dep in done:
+                continue
+            done.add(dep)
+            req = graph.requirements(dep)
+            if req is not None:
+                res.append(req)
+    return res
+
+
+def pip_install_requirements_files(requirements_paths, silent=False, wheelhouse=None,
+                                   state=None, force=False):
+    """Install many requirements files with a single pip invocation.
+
+    :param requirements_paths: list of requirements files paths
+    :param silent: Hide pip output
+    :param wheelhouse: Optional local directory with wheels to install from, \
+    without accessing the package index.
+    :param state: Optional :class:`RequirementsState`. If no file has changed \
+    since its last install nothing is installed, otherwise all of them are \
+    installed together so they are resolved at once.
+    :param force: Install even if no file has changed
+    :return: the merged requirement lines, empty if nothing was installed
+    """
+    import tempfile
+    requirements_paths = [r for r in requirements_paths if os.path.exists(r)]
+    digests = dict((r, requirements_hash(r)) for r in requirements_paths)
+    if state is not None and not force and all(
+            state.is_installed(r, digests[r]) for r in requirements_paths):
+        logger.info('Requirements files not changed. Skipping.')
+        return []
+    requirements = merge_requirements(requirements_paths)
+    if not requirements:
+        return requirements
+    subprocess_kwargs = {}
+    if silent:
+        FNULL = open(os.devnull, 'w')
+        subprocess_kwargs = {
+            'stderr': FNULL,
+            'stdout': FNULL
+        }
+    fd, merged_path = tempfile.mkstemp(
+        prefix='oopgrade-requirements-', suffix='.txt'
+    )
+    try:
+        with os.fdopen(fd, 'w') as merged_file:
+            merged_file.write('\n'.join(requirements) + '\n')
+        pip = os.path.join(sys.prefix, 'bin', 'pip')
+        cmd = [pip, 'install', '-r', merged_path]
+        if wheelhouse:
+            cmd += ['--no-index', '--find-links', wheelhouse]
+        logger.info(
+            'Installing %s requirements from %s files...',
+            len(requirements), len(requirements_paths)
+        )
+        subprocess.check_call(cmd, **subprocess_kwargs)
+    finally:
+        os.unlink(merged_path)
+    if state is not None:
+        for requirements_path in requirements_paths:
+            state.mark_installed(requirements_path, digests[requirements_path])
+    return requirements
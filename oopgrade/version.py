@@ -2,6 +2,39 @@ from builtins import object
 import six
 import semver
 
+_KEY_CACHE = {}
+_KEY_CACHE_SIZE = 10000
+
+
+def _prerelease_key(prerelease):
+    # A version without prerelease has higher precedence, numeric
+    # identifiers are lower than alphanumeric ones and compared numerically.
+    if not prerelease:
+        return (1, ())
+    return (0, tuple(
+        (0, int(part), '') if part.isdigit() else (1, 0, part)
+        for part in prerelease.split('.')
+    ))
+
+
+def version_key(version):
+    """Get the comparable key of a semantic version string.
+
+    :param version: version string
+    :returns: tuple (major, minor, patch, prerelease key)
+    """
+    key = _KEY_CACHE.get(version)
+    if key is None:
+        info = semver.parse(version)
+        key = (
+            info['major'], info['minor'], info['patch'],
+            _prerelease_key(info['prerelease'])
+        )
+        if len(_KEY_CACHE) >= _KEY_CACHE_SIZE:
+            _KEY_CACHE.clear()
+        _KEY_CACHE[version] = key
+    return key
+
 
 class Version(object):
     """Version class using semantic version parsing
@@ -35,30 +68,69 @@ class Version(object):
         """
         self.version = semver.bump_patch(self.version)
 
-    def __gt__(self, other):
+    @property
+    def key(self):
+        """Comparable key following the semantic versioning precedence (the
+        build metadata is ignored). Parsed once per version string.
+        """
+        return version_key(self.version)
+
+    @staticmethod
+    def sort_key(version):
+        """Sort key for versions given as strings or :class:`Version`, e.g.
+        `sorted(['1.10.0', '1.9.0'], key=Version.sort_key)`.
+        """
+        if isinstance(version, Version):
+            return version.key
+        return version_key(version)
+
+    def _other_key(self, other):
+        if isinstance(other, Version):
+            return other.key
         if isinstance(other, six.string_types):
-            other = Version(other)
-        return semver.match(self.version, '>{}'.format(other.version))
+            return version_key(other)
+        return None
+
+    def __gt__(self, other):
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key > other_key
 
     def __ge__(self, other):
-        if isinstance(other, six.string_types):
-            other = Version(other)
-        return semver.match(self.version, '>={}'.format(other.version))
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key >= other_key
 
     def __lt__(self, other):
-        if isinstance(other, six.string_types):
-            other = Version(other)
-        return semver.match(self.version, '<{}'.format(other.version))
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key < other_key
 
     def __le__(self, other):
-        if isinstance(other, six.string_types):
-            other = Version(other)
-        return semver.match(self.version, '<={}'.format(other.version))
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key <= other_key
 
     def __eq__(self, other):
-        if isinstance(other, six.string_types):
-            other = Version(other)
-        return semver.match(self.version, '=={}'.format(other.version))
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key == other_key
+
+    def __ne__(self, other):
+        other_key = self._other_key(other)
+        if other_key is None:
+            return NotImplemented
+        return self.key != other_key
+
+    def __hash__(self):
+        # Bumping the version changes the hash: do not bump versions used as
+        # dict keys or in sets.
+        return hash(self.key)
 
     def __unicode__(self):
         return u'v{}'.format(self.version)
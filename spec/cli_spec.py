@@ -0,0 +1,25 @@
+# coding=utf-8
+from expects import *
+import json
+import subprocess
+import sys
+
+
+def imported_modules(target, modules):
+    script = (
+        'import json, sys; import {}; '
+        'print(json.dumps([m for m in {!r} if m in sys.modules]))'
+    ).format(target, modules)
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+with description('Importing the CLI'):
+    with it('must not import the dependencies of the subcommands'):
+        heavy = [
+            'lxml', 'ooquery', 'sql', 'psycopg2', 'tqdm', 'redis',
+            'itsdangerous', 'pkg_resources', 'osconf'
+        ]
+        if sys.version_info < (3, 7):
+            heavy = ['psycopg2', 'tqdm', 'redis', 'itsdangerous', 'osconf']
+        expect(imported_modules('oopgrade.cli', heavy)).to(be_empty)
@@ -0,0 +1,100 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+from oopgrade.cursor import batch_cursor
+from oopgrade.explain import ExplainCursor
+from oopgrade.instrument import InstrumentedCursor, collect
+
+
+class FakeRawCursor(object):
+    """Stand-in for a psycopg2 cursor."""
+
+    def __init__(self):
+        self.copied = []
+        self.connection = Mock()
+        self.named = self.connection.cursor.return_value
+        self.named.__iter__ = Mock(return_value=iter([(1, ), (2, )]))
+
+    def copy_from(self, file, table, columns=None):
+        self.copied.append((table, columns, file.read()))
+
+
+class FakeOpenERPCursor(object):
+    def __init__(self, cursor):
+        self._obj = cursor
+
+
+with description('A batch cursor'):
+    with before.each:
+        self.cursor = Mock()
+        self.cursor.rowcount = 2
+
+    with it('must insert many rows with one statement per page'):
+        total = batch_cursor(self.cursor).execute_many_values(
+            "INSERT INTO t (a, b) VALUES %s ON CONFLICT DO NOTHING",
+            [(1, 'x'), (2, 'y'), (3, 'z')], page_size=2
+        )
+        expect(total).to(equal(4))
+        expect(self.cursor.execute.call_args_list[0][0]).to(equal((
+            "INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s) ON CONFLICT DO NOTHING",
+            [1, 'x', 2, 'y']
+        )))
+        expect(self.cursor.execute.call_args_list[1][0][0]).to(
+            equal("INSERT INTO t (a, b) VALUES (%s, %s) ON CONFLICT DO NOTHING")
+        )
+
+    with it('must require a single VALUES placeholder'):
+        cursor = batch_cursor(self.cursor)
+        expect(lambda: cursor.execute_many_values(
+            "INSERT INTO t (a) VALUES %s WHERE %s", [(1, )]
+        )).to(raise_error(ValueError))
+        cursor.execute_many_values(
+            "INSERT INTO t (a) SELECT x FROM (VALUES %s) v(x) WHERE 'a' LIKE '%%'",
+            [(1, )]
+        )
+
+    with it('must copy rows through known wrappers of a psycopg2 cursor'):
+        raw = FakeRawCursor()
+        cursor = batch_cursor(InstrumentedCursor(FakeOpenERPCursor(raw)))
+        with patch('oopgrade.cursor._psycopg2_cursor_class', return_value=FakeRawCursor):
+            with collect() as stats:
+                copied = cursor.copy_rows(
+                    't', [(1, True, None), (2, False, 'a\tb')], ['a', 'b', 'c']
+                )
+        expect(copied).to(equal(2))
+        expect(raw.copied).to(equal([
+            ('t', ['a', 'b', 'c'], '1\tt\t\\N\n2\tf\ta\\tb\n')
+        ]))
+        expect(stats.total_calls).to(equal(1))
+
+    with it('must insert the rows instead of copying them in a dry-run'):
+        raw = FakeRawCursor()
+        explain = ExplainCursor(raw)
+        with patch('oopgrade.cursor._psycopg2_cursor_class', return_value=FakeRawCursor):
+            with patch.object(ExplainCursor, 'execute') as execute:
+                batch_cursor(explain).copy_rows('t', [(1, ), (2, )], ['a'])
+        expect(raw.copied).to(equal([]))
+        expect(execute.call_args[0]).to(equal(
+            ('INSERT INTO "t" ("a") VALUES (%s), (%s)', [1, 2])
+        ))
+
+    with it('must stream rows with a named cursor when possible'):
+        raw = FakeRawCursor()
+        with patch('oopgrade.cursor._psycopg2_cursor_class', return_value=FakeRawCursor):
+            rows = list(batch_cursor(FakeOpenERPCursor(raw)).fetch_iter(
+                'SELECT id FROM t', itersize=10
+            ))
+        expect(rows).to(equal([(1, ), (2, )]))
+        expect(raw.named.itersize).to(equal(10))
+        expect(raw.named.close.called).to(be_true)
+
+    with it('must fall back to fetchmany'):
+        self.cursor.fetchmany.side_effect = [[(1, ), (2, )], [(3, )], []]
+        rows = list(batch_cursor(self.cursor).fetch_iter('SELECT id FROM t', itersize=2))
+        expect(rows).to(equal([(1, ), (2, ), (3, )]))
+        self.cursor.execute.assert_called_once_with('SELECT id FROM t', None)
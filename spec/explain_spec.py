@@ -0,0 +1,85 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import Mock, call
+else:
+    from unittest.mock import Mock, call
+
+from oopgrade.explain import dry_run
+from oopgrade.oopgrade import logged_query
+
+
+def plan(cost, node='Seq Scan', relation='res_partner'):
+    return [[{'Plan': {
+        'Node Type': 'Update', 'Total Cost': cost, 'Plan Rows': 10,
+        'Plans': [{'Node Type': node, 'Relation Name': relation}]
+    }}]]
+
+
+with description('A dry-run'):
+    with it('must explain DML statements without executing them'):
+        cursor = Mock()
+        cursor.fetchone.return_value = plan(100.0)
+        with dry_run(cursor) as explain_cursor:
+            logged_query(explain_cursor, 'UPDATE res_partner SET a = %s', (1,))
+        expect(cursor.execute.call_args_list).to(equal([
+            call('SAVEPOINT oopgrade_explain'),
+            call('EXPLAIN (FORMAT JSON) UPDATE res_partner SET a = %s', (1,)),
+            call('ROLLBACK TO SAVEPOINT oopgrade_explain'),
+        ]))
+        steps = explain_cursor.plan()
+        expect(steps).to(have_len(1))
+        expect(steps[0]).to(have_keys(
+            helper='logged_query', kind='UPDATE', total_cost=100.0,
+            plan_rows=10, seq_scans=['res_partner'], executed=False
+        ))
+
+    with it('must execute SELECT statements and sort by cost'):
+        cursor = Mock()
+        cursor.fetchone.side_effect = [plan(1.0), plan(50.0)]
+        with dry_run(cursor, analyze=True) as explain_cursor:
+            explain_cursor.execute('SELECT id FROM res_partner')
+            explain_cursor.execute('DELETE FROM res_partner')
+            explain_cursor.execute('ALTER TABLE res_partner DROP COLUMN a')
+        expect(cursor.execute.call_args_list).to(contain(
+            call('EXPLAIN (FORMAT JSON) SELECT id FROM res_partner'),
+            call('EXPLAIN (ANALYZE, FORMAT JSON) DELETE FROM res_partner'),
+        ))
+        expect(cursor.execute.call_args_list.count(
+            call('SELECT id FROM res_partner')
+        )).to(equal(1))
+        expect(cursor.execute.call_args_list).not_to(contain(
+            call('DELETE FROM res_partner')
+        ))
+        kinds = [s['kind'] for s in explain_cursor.plan('total_cost')]
+        expect(kinds).to(equal(['DELETE', 'SELECT', 'ALTER']))
+
+    with it('must classify WITH statements by their CTEs and main statement'):
+        cursor = Mock()
+        cursor.fetchone.return_value = plan(1.0)
+        with dry_run(cursor) as explain_cursor:
+            explain_cursor.execute('WITH a AS (SELECT 1) SELECT * FROM a')
+            explain_cursor.execute(
+                'WITH a AS (DELETE FROM b RETURNING id) SELECT * FROM a'
+            )
+        expect(cursor.execute.call_args_list).to(contain(
+            call('WITH a AS (SELECT 1) SELECT * FROM a')
+        ))
+        executed = [s['executed'] for s in explain_cursor.plan()]
+        expect(executed).to(equal([True, False]))
+
+    with it('must never apply executemany or COPY'):
+        cursor = Mock()
+        cursor.fetchone.return_value = plan(1.0)
+        with dry_run(cursor) as explain_cursor:
+            explain_cursor.executemany(
+                'UPDATE res_partner SET a = %s', [(1,), (2,)]
+            )
+            explain_cursor.copy_from(Mock(), 'res_partner', columns=('a',))
+            explain_cursor.copy_expert('COPY res_partner FROM STDIN', Mock())
+        expect(cursor.executemany.called).to(be_false)
+        expect(cursor.copy_from.called).to(be_false)
+        expect(cursor.copy_expert.called).to(be_false)
+        kinds = [s['kind'] for s in explain_cursor.plan()]
+        expect(kinds).to(equal(['UPDATE', 'UPDATE', 'COPY', 'COPY']))
@@ -0,0 +1,5 @@
+{
+    'name': 'base',
+    'version': '0-dev',
+    'depends': [],
+}
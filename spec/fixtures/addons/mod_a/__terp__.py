@@ -0,0 +1,5 @@
+{
+    'name': 'mod_a',
+    'version': '0-dev',
+    'depends': ['base'],
+}
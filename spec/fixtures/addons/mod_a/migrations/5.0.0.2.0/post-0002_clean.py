@@ -0,0 +1,9 @@
+def up(cursor, installed_version):
+    pass
+
+
+def down(cursor, installed_version):
+    pass
+
+
+migrate = up
@@ -0,0 +1,5 @@
+{
+    'name': 'mod_b',
+    'version': '0-dev',
+    'depends': ['mod_a', 'base'],
+}
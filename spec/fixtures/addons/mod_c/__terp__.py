@@ -0,0 +1,5 @@
+{
+    'name': 'mod_c',
+    'version': '0-dev',
+    'depends': ['mod_b', 'mod_a'],
+}
@@ -0,0 +1,62 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import patch, MagicMock
+else:
+    from unittest.mock import patch, MagicMock
+
+from oopgrade.fleet import inspect_databases
+
+
+def fake_connect(dbname, **kwargs):
+    if dbname == 'broken':
+        raise RuntimeError('database "broken" does not exist')
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    results = {}
+
+    def execute(query, args=None):
+        if 'server_version' in query:
+            results['fetch'] = [('14.5', )]
+        elif 'ir_module_module' in query:
+            results['fetch'] = [('base', 'installed', '5.0.1')]
+        elif 'pg_attribute' in query:
+            results['fetch'] = [('res_partner.vat', )]
+        else:
+            results['fetch'] = [('res_partner', )]
+
+    cursor.execute.side_effect = execute
+    cursor.fetchone.side_effect = lambda: results['fetch'][0]
+    cursor.fetchall.side_effect = lambda: results['fetch']
+    return conn
+
+
+with description('Inspecting many databases'):
+    with it('must get the modules and schema facts of every database'):
+        with patch('psycopg2.connect', side_effect=fake_connect):
+            results = inspect_databases(
+                {'user': 'erp'}, ['db1', 'broken', 'db2'],
+                modules=['base', 'account'], tables=['res_partner', 'foo'],
+                columns=['res_partner.vat', 'res_partner.foo'], workers=2
+            )
+        expect([r['database'] for r in results]).to(
+            equal(['db1', 'broken', 'db2'])
+        )
+        db1 = results[0]
+        expect(db1['error']).to(be_none)
+        expect(db1['server_version']).to(equal('14.5'))
+        expect(db1['modules']).to(equal({
+            'base': {'state': 'installed', 'version': '5.0.1'},
+            'account': {'state': None, 'version': None},
+        }))
+        expect(db1['tables']).to(equal({'res_partner': True, 'foo': False}))
+        expect(db1['columns']).to(equal(
+            {'res_partner.vat': True, 'res_partner.foo': False}
+        ))
+        expect(results[1]['error']).to(contain('does not exist'))
+
+    with it('must reject columns without table'):
+        expect(lambda: inspect_databases({}, ['db1'], columns=['vat'])).to(
+            raise_error(ValueError)
+        )
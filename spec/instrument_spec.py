@@ -0,0 +1,97 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import Mock
+else:
+    from unittest.mock import Mock
+
+from oopgrade import instrument
+from oopgrade.oopgrade import add_columns, MigrationHelper
+
+
+with description('Instrumenting helpers'):
+    with after.each:
+        instrument.disable()
+
+    with it('must not wrap cursors when disabled'):
+        cursor = Mock()
+        expect(instrument.wrap(cursor)).to(be(cursor))
+
+    with it('must record statements by calling helper'):
+        stats = instrument.enable()
+        cursor = Mock()
+        cursor.rowcount = 0
+        cursor.fetchone.side_effect = [[0], [1]]
+        add_columns(cursor, {'test_model': [
+            ('random1', 'integer'), ('random2', 'integer')
+        ]})
+        summary = stats.summary(top=None)
+        expect(summary).to(have_len(2))
+        helpers = set(s['helper'] for s in summary)
+        expect(helpers).to(equal(set([
+            'add_columns > column_exists', 'add_columns'
+        ])))
+        calls = dict((s['helper'], s['calls']) for s in summary)
+        expect(calls['add_columns > column_exists']).to(equal(2))
+
+    with it('must attribute statements to MigrationHelper steps'):
+        stats = instrument.enable()
+        cursor = Mock()
+        cursor.rowcount = 5
+        helper = MigrationHelper(cursor, 'module')
+        helper.execute_sql('UPDATE test SET a = 1')
+        summary = stats.summary()
+        expect(summary).to(have_len(1))
+        expect(summary[0]).to(have_keys(
+            helper='MigrationHelper.execute_sql',
+            query='UPDATE test SET a = 1', calls=1, rows=5
+        ))
+
+    with it('must let the cursor of a MigrationHelper be replaced'):
+        stats = instrument.enable()
+        helper = MigrationHelper(Mock(), 'module')
+        cursor = Mock()
+        cursor.rowcount = 1
+        helper.cursor = cursor
+        helper.execute_sql('UPDATE test SET a = 1')
+        expect(cursor.execute.call_count).to(equal(1))
+        expect(stats.total_calls).to(equal(1))
+
+    with it('must record COPY statements'):
+        stats = instrument.QueryStats()
+        cursor = Mock()
+        cursor.rowcount = 2
+        wrapped = instrument.InstrumentedCursor(cursor, stats=stats)
+        wrapped.copy_from(Mock(), 'test', columns=('a', 'b'))
+        wrapped.copy_expert('COPY test TO STDOUT', Mock())
+        expect(cursor.copy_from.call_count).to(equal(1))
+        queries = set(s['query'] for s in stats.summary(top=None))
+        expect(queries).to(equal(set([
+            'COPY test (a, b) FROM STDIN', 'COPY test TO STDOUT'
+        ])))
+
+    with it('must sort the summary by total time'):
+        stats = instrument.QueryStats()
+        stats.record('a', 'SELECT 1', 0.5, 1)
+        stats.record('b', 'SELECT 2', 2.0, 1)
+        stats.record('a', 'SELECT 1', 2.0, 1)
+        summary = stats.summary(top=1)
+        expect(summary).to(have_len(1))
+        expect(summary[0]).to(have_keys(
+            helper='a', query='SELECT 1', calls=2, total_time=2.5,
+            max_time=2.0, rows=2
+        ))
+
+
+with description('Classifying statements'):
+    with it('must skip comments before the statement'):
+        expect(instrument.statement_kind(
+            '/* c */ UPDATE a SET b = 1'
+        )).to(equal('UPDATE'))
+        expect(instrument.is_dml(
+            '-- line\n/* block\n comment */ DELETE FROM a'
+        )).to(be_true)
+        expect(instrument.is_dml(
+            'WITH x AS (/* DELETE */ SELECT 1) SELECT * FROM x'
+        )).to(be_false)
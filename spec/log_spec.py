@@ -0,0 +1,74 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+from oopgrade.log import XmlIdRecorder
+
+
+def fake_cursor(logged, model_data):
+    cursor = Mock()
+    results = {}
+
+    def execute(query, args=None):
+        if query.startswith('SELECT model, name FROM openupgrade_record'):
+            results['fetch'] = list(logged)
+        elif query.startswith('SELECT name, model FROM ir_model_data'):
+            module, names = args
+            results['fetch'] = [
+                (name, model_data[(module, name)]) for name in names
+                if (module, name) in model_data
+            ]
+        else:
+            results['fetch'] = []
+
+    cursor.execute.side_effect = execute
+    cursor.fetchall.side_effect = lambda: results['fetch']
+    return cursor
+
+
+with description('Recording xml ids in bulk'):
+    with before.each:
+        self.model_data = {
+            ('my_module', 'view_a'): 'ir.ui.view',
+            ('my_module', 'view_b'): 'ir.ui.view',
+            ('base', 'group_user'): 'res.groups',
+        }
+        self.cursor = fake_cursor(
+            [('ir.ui.view', 'my_module.view_a')], self.model_data
+        )
+
+    with it('must insert only the new records in one statement'):
+        with patch('oopgrade.log.table_exists', return_value=True) as exists:
+            with XmlIdRecorder(self.cursor, 'my_module') as recorder:
+                for xml_id in ['view_a', 'view_b', 'base.group_user',
+                               'view_b', 'missing']:
+                    recorder.record(xml_id)
+            expect(exists.call_count).to(equal(1))
+        inserts = [
+            c[0] for c in self.cursor.execute.call_args_list
+            if c[0][0].startswith('INSERT')
+        ]
+        expect(inserts).to(have_len(1))
+        expect(inserts[0][1]).to(equal([
+            'my_module', 'res.groups', 'base.group_user', 'xmlid',
+            'my_module', 'ir.ui.view', 'my_module.view_b', 'xmlid',
+        ]))
+
+    with it('must flush every buffer_size xml ids'):
+        with patch('oopgrade.log.table_exists', return_value=True):
+            recorder = XmlIdRecorder(self.cursor, 'my_module', buffer_size=2)
+            recorder.record('view_b')
+            expect(self.cursor.execute.call_count).to(equal(1))
+            recorder.record('base.group_user')
+            expect(self.cursor.execute.call_count).to(equal(4))
+            expect(recorder.flush()).to(equal(0))
+
+    with it('must do nothing without the records table'):
+        with patch('oopgrade.log.table_exists', return_value=False):
+            with XmlIdRecorder(self.cursor, 'my_module') as recorder:
+                recorder.record('view_b')
+        expect(self.cursor.execute.called).to(be_false)
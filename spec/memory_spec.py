@@ -0,0 +1,68 @@
+# coding=utf-8
+from expects import *
+import threading
+import six
+if six.PY2:
+    from mock import Mock
+else:
+    from unittest.mock import Mock
+
+from oopgrade.oopgrade import MigrationHelper
+from oopgrade.instrument import span
+from oopgrade.memory import MemoryProfiler, get_rss
+
+
+with description('A MemoryProfiler'):
+    with it('must record the memory of each step in the report'):
+        cursor = Mock()
+        helper = MigrationHelper(cursor, 'module', report=True)
+        with MemoryProfiler(report=helper.report, rss_interval=0.01):
+            helper.execute_sql('SELECT 1')
+        memory = helper.report.to_dict()['memory']
+        expect(memory).to(have_len(1))
+        expect(memory[0]).to(have_keys(
+            name='MigrationHelper.execute_sql', category='helper', depth=0
+        ))
+        if six.PY3:
+            expect(memory[0]['peak_traced']).to(be_above(0))
+            expect(memory[0]['top_allocations']).not_to(be_empty)
+        expect(memory[0]['peak_rss']).to(be_above_or_equal(get_rss() // 2))
+
+    with it('must propagate the peak of nested steps to their parents'):
+        profiler = MemoryProfiler(rss_interval=None, top_allocations=0)
+        with profiler:
+            with span('outer'):
+                with span('inner'):
+                    data = [bytearray(1024) for _ in range(1000)]
+                    del data
+        inner, outer = profiler.records
+        expect(inner).to(have_keys(name='inner', depth=1))
+        expect(outer).to(have_keys(name='outer', depth=0))
+        if six.PY3:
+            expect(outer['peak_traced']).to(
+                be_above_or_equal(inner['peak_traced'])
+            )
+            expect(inner['peak_traced']).to(be_above(1024 * 1000))
+
+    with it('must track the steps of each thread separately'):
+        profiler = MemoryProfiler(rss_interval=0.01, top_allocations=0)
+        started = threading.Event()
+        done = threading.Event()
+
+        def work():
+            with span('thread'):
+                started.set()
+                done.wait(5)
+
+        with profiler:
+            thread = threading.Thread(target=work)
+            thread.start()
+            started.wait(5)
+            with span('main'):
+                pass
+            done.set()
+            thread.join()
+        records = dict((r['name'], r) for r in profiler.records)
+        expect(records['main']).to(have_keys(depth=0))
+        expect(records['thread']).to(have_keys(depth=0))
+        expect(records['thread']['peak_rss']).to(be_above(0))
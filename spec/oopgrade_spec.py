@@ -0,0 +1,239 @@
+# coding=utf-8
+from expects import *
+import sys
+import six
+if six.PY2:
+    from mock import Mock, MagicMock, call, patch
+else:
+    from unittest.mock import Mock, MagicMock, call, patch
+
+from lxml import etree
+from oopgrade.oopgrade import (
+    set_defaults, load_data_records, load_access_rules_from_model_name,
+    load_translations_bulk, load_translations_file, MigrationHelper
+)
+import os
+
+
+_ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+with description('Setting defaults'):
+    with before.each:
+        self.osv_patch = patch.dict(sys.modules, {'osv': Mock()})
+        self.osv_patch.start()
+        self.obj = Mock()
+        self.obj._table = 'test_model'
+        self.pool = Mock()
+        self.pool.get.return_value = self.obj
+
+    with after.each:
+        self.osv_patch.stop()
+
+    with it('must call the default function once per create_uid'):
+        default = Mock(side_effect=lambda obj, cr, uid, ctx: uid * 10)
+        self.obj._defaults = {'company_id': default}
+        self.obj.search.return_value = [1, 2, 3, 4]
+        cursor = Mock()
+        cursor.fetchall.return_value = [(1, 1), (2, 5), (3, 1), (4, 5)]
+        set_defaults(cursor, self.pool, {'test.model': [('company_id', None)]})
+        expect(default.call_count).to(equal(2))
+        expect(self.obj.write.call_args_list).to(contain_exactly(
+            call(cursor, 1, [1, 3], {'company_id': 10}),
+            call(cursor, 1, [2, 4], {'company_id': 50}),
+        ))
+
+    with it('must write constant values with one UPDATE using SQL'):
+        self.obj._defaults = {}
+        cursor = Mock()
+        cursor.rowcount = 3
+        set_defaults(
+            cursor, self.pool, {'test.model': [('company_id', 1)]},
+            use_sql=True
+        )
+        expect(self.obj.search.called).to(be_false)
+        expect(self.obj.write.called).to(be_false)
+        expect(cursor.execute.call_args_list).to(contain_exactly(
+            call(
+                'UPDATE "test_model" SET "company_id" = %s '
+                'WHERE "company_id" IS NULL', (1,)
+            )
+        ))
+
+    with it('must use the constant model default with SQL'):
+        self.obj._defaults = {'state': 'draft'}
+        cursor = Mock()
+        cursor.rowcount = 3
+        set_defaults(
+            cursor, self.pool, {'test.model': [('state', None)]},
+            force=True, use_sql=True
+        )
+        expect(cursor.execute.call_args_list).to(contain_exactly(
+            call('UPDATE "test_model" SET "state" = %s', ('draft',))
+        ))
+
+
+with description('Loading data records'):
+    with before.each:
+        self.tag_loader = Mock()
+        self.xml_import = MagicMock()
+        self.xml_import.return_value._tags.__getitem__.return_value = (
+            self.tag_loader
+        )
+        tools = Mock()
+        tools.config = {'addons_path': _ROOT}
+        tools.xml_import = self.xml_import
+        self.tools_patch = patch.dict(sys.modules, {'tools': tools})
+        self.tools_patch.start()
+
+    with after.each:
+        self.tools_patch.stop()
+
+    with it('must load the requested records with their parent'):
+        cursor = Mock()
+        load_data_records(
+            cursor, 'fixtures', 'migration_data.xml',
+            ['record_id_0002', 'record_id_0001']
+        )
+        loaded = [
+            (c[0][1].get('id'), c[0][2].tag)
+            for c in self.tag_loader.call_args_list
+        ]
+        expect(loaded).to(equal([
+            ('record_id_0002', 'data'), ('record_id_0001', 'data')
+        ]))
+        parent = self.tag_loader.call_args_list[0][0][2]
+        expect(parent.get('noupdate')).to(equal('1'))
+
+    with it('must raise if a record is not found'):
+        def callback():
+            load_data_records(
+                Mock(), 'fixtures', 'migration_data.xml', ['missing_id']
+            )
+        expect(callback).to(raise_error(Exception))
+
+    with it('must parse the document once when sharing a cache'):
+        helper = MigrationHelper(Mock(), 'fixtures')
+        with patch('lxml.etree.parse', wraps=etree.parse) as parse:
+            helper.update_xml_records(
+                'migration_data.xml',
+                init_record_ids=['record_id_0001'],
+                update_record_ids=['record_id_0002']
+            )
+            helper.update_xml_records(
+                'migration_data.xml', update_record_ids=['record_id_0004']
+            )
+            expect(parse.call_count).to(equal(1))
+        expect(self.tag_loader.call_count).to(equal(3))
+
+
+with description('Loading access rules'):
+    with before.each:
+        self.tools = Mock()
+        self.tools.file_open.side_effect = lambda path: open(
+            os.path.join(_ROOT, path)
+        )
+        self.tools_patch = patch.dict(sys.modules, {'tools': self.tools})
+        self.tools_patch.start()
+
+    with after.each:
+        self.tools_patch.stop()
+
+    with it('must only load the rules of the given models'):
+        cursor = Mock()
+        load_access_rules_from_model_name(
+            cursor, 'fixtures', ['model_test_model']
+        )
+        data = self.tools.convert_csv_import.call_args[0][3]
+        expect(data.splitlines()).to(equal([
+            '"id","name","model_id:id","group_id:id","perm_read",'
+            '"perm_write","perm_create","perm_unlink"',
+            '"access_test_model_r","test.model, read","model_test_model",'
+            '"base.group_user","1","0","0","0"',
+            '"access_test_model_w","test.model, write","model_test_model",'
+            '"base.group_system","1","1","1","1"',
+        ]))
+
+    with it('must keep the order of the file'):
+        load_access_rules_from_model_name(
+            Mock(), 'fixtures', ['model_test_other_model', 'model_test_model']
+        )
+        data = self.tools.convert_csv_import.call_args[0][3]
+        expect([line.split(',')[0] for line in data.splitlines()]).to(equal([
+            '"id"', '"access_test_model_r"', '"access_test_model_w"',
+            '"access_other_model"',
+        ]))
+
+    with it('must find the model column by its header'):
+        load_access_rules_from_model_name(
+            Mock(), 'fixtures', ['model_test_other_model'],
+            filename='security/ir.model.access.reordered.csv'
+        )
+        data = self.tools.convert_csv_import.call_args[0][3]
+        expect(data.splitlines()[1:]).to(equal([
+            '"access_other_model","model_test_other_model",'
+            '"test.other.model","base.group_user","1","0","0","0"',
+        ]))
+
+    with it('must raise if a model has no rules'):
+        def callback():
+            load_access_rules_from_model_name(
+                Mock(), 'fixtures', ['model_missing']
+            )
+        expect(callback).to(raise_error(Exception))
+
+
+with description('Loading translations in bulk'):
+    with before.each:
+        # Mock cursors stand in for psycopg2 cursors, so COPY is used
+        self.raw_patch = patch(
+            'oopgrade.cursor._psycopg2_cursor_class', return_value=Mock
+        )
+        self.raw_patch.start()
+
+    with after.each:
+        self.raw_patch.stop()
+
+    with it('must stream the translations with COPY and merge them'):
+        cursor = Mock()
+        cursor.fetchone.return_value = [0]
+        cursor.rowcount = 1
+        copied = []
+        cursor.copy_from.side_effect = lambda f, *a, **kw: copied.append(
+            f.read(5) + f.read()
+        )
+        total = load_translations_bulk(cursor, [
+            ('ca_ES', 'res.partner,name', 'field', False, 'Name', 'Nom'),
+            {
+                'lang': 'ca_ES', 'name': 'res.partner,name', 'type': 'model',
+                'res_id': 3, 'src': 'A\tb', 'value': 'A\\b\nc'
+            },
+            ('ca_ES', 'ir.ui.menu,name', 'model', 'test.menu', 'M', 'M'),
+        ])
+        expect(total).to(equal(2))
+        expect(copied[0].splitlines()).to(equal([
+            'ca_ES\tres.partner,name\tfield\t\\N\t\\N\tName\tNom',
+            'ca_ES\tres.partner,name\tmodel\t3\t\\N\tA\\tb\tA\\\\b\\nc',
+            'ca_ES\tir.ui.menu,name\tmodel\t\\N\ttest.menu\tM\tM',
+        ]))
+        statements = [c[0][0] for c in cursor.execute.call_args_list]
+        upserts = [s for s in statements if s.startswith('INSERT')]
+        expect(upserts).to(have_len(2))
+
+    with it('must read translations from PO files'):
+        cursor = Mock()
+        cursor.fetchone.return_value = [0]
+        cursor.rowcount = 0
+        copied = []
+        cursor.copy_from.side_effect = lambda f, *a, **kw: copied.append(
+            f.read()
+        )
+        load_translations_file(
+            cursor, os.path.join(_ROOT, 'fixtures', 'translations.po'), 'ca_ES'
+        )
+        expect(copied[0].splitlines()).to(equal([
+            'ca_ES\tres.partner,name\tfield\t0\t\\N\tName\tNom',
+            'ca_ES\tres.partner\tview\t0\t\\N\tName\tNom',
+            'ca_ES\tir.ui.menu,name\tmodel\t\\N\ttest.menu_partner\t'
+            'Partners\\nwith "tabs"\\t\tEmpreses\\namb "tabs"\\t',
+        ]))
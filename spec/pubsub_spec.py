@@ -0,0 +1,165 @@
+# coding=utf-8
+from expects import *
+import json
+import six
+if six.PY2:
+    from mock import patch, MagicMock
+else:
+    from unittest.mock import patch, MagicMock
+
+from click.testing import CliRunner
+from itsdangerous import Signer
+
+from oopgrade.pubsub import Publisher, build_msg
+
+
+with description('Publishing messages'):
+    with before.each:
+        self.redis = MagicMock()
+        self.pipe = self.redis.pipeline.return_value
+        self.executed = 0
+
+        def execute():
+            pending = self.pipe.publish.call_args_list[self.executed:]
+            self.executed += len(pending)
+            return [2] * len(pending)
+        self.pipe.execute.side_effect = execute
+        self.publisher = Publisher(
+            'redis://localhost', 'secret', connection=self.redis
+        )
+
+    with it('must sign the published messages'):
+        self.redis.publish.return_value = 3
+        expect(self.publisher.publish('db.channel', 'msg')).to(equal(3))
+        channel, signed = self.redis.publish.call_args[0]
+        expect(channel).to(equal('db.channel'))
+        expect(Signer('secret').unsign(signed)).to(equal(b'msg'))
+
+    with it('must publish many messages in batches through a pipeline'):
+        messages = [('db.channel', 'msg{}'.format(i)) for i in range(5)]
+        sent_to = self.publisher.publish_many(messages, batch_size=2)
+        expect(sent_to).to(equal([2] * 5))
+        expect(self.pipe.execute.call_count).to(equal(3))
+        expect(self.redis.publish.called).to(be_false)
+        expect(self.redis.pipeline.call_count).to(equal(1))
+
+    with it('must send newline-delimited JSON messages from the CLI'):
+        from oopgrade.cli import oopgrade
+        lines = '\n'.join([
+            json.dumps({'method': 'reload', 'kwargs': {'model': 'res.partner'}}),
+            '',
+            json.dumps({'method': 'clear', 'channel': 'other'}),
+        ])
+        env = {
+            'OPENERP_SECRET': 'secret', 'OPENERP_REDIS_URL': 'redis://localhost',
+            'OPENERP_DB_NAME': 'db'
+        }
+        with patch('oopgrade.pubsub.Publisher.publish_many') as publish_many:
+            publish_many.return_value = [1, 1]
+            result = CliRunner().invoke(
+                oopgrade, ['pubsub', '--channel', 'cache', '--from-file', '-'],
+                input=lines, env=env
+            )
+        expect(result.exit_code).to(equal(0))
+        expect(result.output).to(contain('2 messages sent to 2 nodes'))
+        messages = publish_many.call_args[0][0]
+        expect([c for c, m in messages]).to(equal(['db.cache', 'db.other']))
+        expect(messages[0][1]).to(equal(
+            build_msg('reload', {'model': 'res.partner'})
+        ))
+
+
+with description('Publishing a message to many databases'):
+    with it('must publish the signed message to the channel of every database'):
+        # redis.asyncio is only available on Python 3
+        if six.PY3:
+            import asyncio
+            from oopgrade.fanout import publish_fanout
+            redis = MagicMock()
+            redis.publish.side_effect = lambda channel, msg: asyncio.sleep(
+                0, result=2 if channel.startswith('db1') else 0
+            )
+            res = publish_fanout(
+                'redis://localhost', 'secret', 'pubsub', ['db1', 'db2'],
+                build_msg('reload'), connection=redis
+            )
+            expect(res['channels']).to(equal({'db1.pubsub': 2, 'db2.pubsub': 0}))
+            expect(res['elapsed']).to(be_a(float))
+            signed = redis.publish.call_args[0][1]
+            expect(Signer('secret').unsign(signed)).to(
+                equal(build_msg('reload').encode('utf-8'))
+            )
+
+    with it('must keep at most concurrency messages in flight'):
+        if six.PY3:
+            import asyncio
+            from oopgrade.fanout import publish_fanout
+            from inspect import getcoroutinestate, CORO_CLOSED
+            published = []
+            in_flight = []
+
+            def publish(channel, msg):
+                in_flight.append(len([
+                    c for c in published if getcoroutinestate(c) != CORO_CLOSED
+                ]) + 1)
+                published.append(asyncio.sleep(0.001, result=1))
+                return published[-1]
+
+            redis = MagicMock()
+            redis.publish.side_effect = publish
+            databases = ['db{}'.format(i) for i in range(10)]
+            res = publish_fanout(
+                'redis://localhost', 'secret', 'pubsub', databases,
+                build_msg('reload'), connection=redis, concurrency=3
+            )
+            expect(res['channels']).to(have_len(10))
+            expect(max(in_flight)).to(equal(3))
+
+    with it('must report the failed publishes of each channel'):
+        if six.PY3:
+            from unittest.mock import AsyncMock
+            from oopgrade.fanout import publish_fanout
+
+            def publish(channel, msg):
+                if channel.startswith('db2'):
+                    raise ConnectionError('down')
+                return 1
+
+            redis = MagicMock()
+            redis.publish = AsyncMock(side_effect=publish)
+            res = publish_fanout(
+                'redis://localhost', 'secret', 'pubsub', ['db1', 'db2', 'db3'],
+                build_msg('reload'), connection=redis
+            )
+            expect(res['channels']).to(equal({'db1.pubsub': 1, 'db3.pubsub': 1}))
+            expect(res['errors']).to(equal({
+                'db2.pubsub': 'ConnectionError: down'
+            }))
+
+    with it('must exit with an error if a channel fails from the CLI'):
+        from oopgrade.cli import oopgrade
+        env = {
+            'OPENERP_SECRET': 'secret', 'OPENERP_REDIS_URL': 'redis://localhost'
+        }
+        res = {
+            'channels': {'db1.cache': 2}, 'elapsed': 0.1,
+            'errors': {'db2.cache': 'ConnectionError: down'}
+        }
+        with patch('oopgrade.fanout.publish_fanout', return_value=res):
+            result = CliRunner().invoke(
+                oopgrade, ['pubsub', '--channel', 'cache', '-d', 'db1',
+                           '-d', 'db2', 'reload'],
+                env=env
+            )
+        expect(result.exit_code).to(equal(1))
+        expect(result.output).to(contain('db1.cache: 2 nodes'))
+        expect(result.output).to(contain('db2.cache: failed: ConnectionError: down'))
+        expect(result.output).to(contain('1 failed'))
+
+    with it('must refuse to publish on Python 2'):
+        if six.PY2:
+            from oopgrade.fanout import publish_fanout
+            expect(lambda: publish_fanout(
+                'redis://localhost', 'secret', 'pubsub', ['db1'],
+                build_msg('reload'), connection=MagicMock()
+            )).to(raise_error(Exception))
@@ -0,0 +1,81 @@
+# coding=utf-8
+from expects import *
+from datetime import datetime
+import json
+import six
+if six.PY2:
+    from mock import Mock
+else:
+    from unittest.mock import Mock
+
+from oopgrade.instrument import InstrumentedCursor
+from oopgrade.oopgrade import MigrationHelper
+from oopgrade.report import MigrationReport
+
+
+with description('A MigrationHelper report'):
+    with it('must record the queries and rows of each step'):
+        cursor = Mock()
+        cursor.rowcount = 3
+        helper = MigrationHelper(cursor, 'module', report=True)
+        helper.execute_sql('UPDATE a SET b = 1').execute_sql('DELETE FROM c')
+        steps = helper.report.steps
+        expect(steps).to(have_len(2))
+        expect(steps[0]).to(have_keys(
+            module='module', step='MigrationHelper.execute_sql',
+            target='UPDATE a SET b = 1', queries=1, rows=3, status='ok'
+        ))
+        report = json.loads(helper.report.to_json())
+        expect(report).to(have_keys(module='module', queries=2, rows=6))
+
+    with it('must record failed steps'):
+        cursor = Mock()
+        cursor.execute.side_effect = ValueError('error')
+        helper = MigrationHelper(cursor, 'module', report=True)
+        expect(lambda: helper.execute_sql('SELECT 1')).to(raise_error(ValueError))
+        expect(helper.report.steps[0]).to(have_keys(status='error', queries=1))
+
+    with it('must only count the rows of data modifying statements'):
+        cursor = Mock()
+        cursor.rowcount = 3
+        helper = MigrationHelper(cursor, 'module', report=True)
+        helper.execute_sql('SELECT id FROM a').execute_sql(
+            'WITH b AS (SELECT 1) UPDATE a SET b = 1'
+        )
+        rows = [s['rows'] for s in helper.report.steps]
+        expect(rows).to(equal([0, 3]))
+
+    with it('must record when the step started'):
+        cursor = Mock()
+        helper = MigrationHelper(cursor, 'module', report=True)
+        before = datetime.now().isoformat()
+        cursor.execute.side_effect = lambda *a: setattr(
+            cursor, 'started_at', datetime.now().isoformat()
+        )
+        helper.execute_sql('UPDATE a SET b = 1')
+        start = helper.report.steps[0]['start']
+        expect(start >= before and start <= cursor.started_at).to(be_true)
+
+    with it('must not wrap the cursor without a report'):
+        cursor = Mock()
+        helper = MigrationHelper(cursor, 'module')
+        cursors = []
+        cursor.execute.side_effect = lambda *a: cursors.append(helper.cursor)
+        helper.execute_sql('UPDATE a SET b = 1')
+        expect(helper.report).to(be_none)
+        expect(cursors[0]).not_to(be_a(InstrumentedCursor))
+
+    with it('must export the steps in Prometheus text format'):
+        report = MigrationReport('module')
+        report.add_step('init_model', 'res.partner', elapsed=1.5, queries=3)
+        report.add_step('init_model', 'res.partner', elapsed=0.5, queries=1)
+        text = report.to_prometheus()
+        expect(text).to(contain(
+            '# TYPE oopgrade_migration_step_duration_seconds gauge\n'
+            'oopgrade_migration_step_duration_seconds{module="module",'
+            'step="init_model",target="res.partner"} 2.0\n'
+        ))
+        expect(text).to(contain(
+            'oopgrade_migration_step_queries{module="module",'
+            'step="init_model",target="res.partner"} 4\n'
+        ))
@@ -0,0 +1,38 @@
+# coding=utf-8
+from expects import *
+import os
+
+_BENCHMARK = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'benchmarks', 'roundtrips.py'
+)
+
+
+def load_benchmark(name, path):
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:
+        import imp
+        return imp.load_source(name, path)
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+with description('The helpers round trips'):
+    with before.all:
+        self.roundtrips = load_benchmark('oopgrade_bench_roundtrips', _BENCHMARK)
+
+    with it('must not exceed the saved baselines'):
+        baseline = self.roundtrips.load_baseline()
+        sizes = sorted(set(
+            int(size) for case in baseline.values() for size in case
+        ))
+        results = self.roundtrips.run(sizes)
+        expect(self.roundtrips.check(results, baseline)).to(equal([]))
+
+    with it('must detect regressions'):
+        results = {'log_xml_id': {'10': {'round_trips': 41, 'bytes_sent': 1}}}
+        baseline = {'log_xml_id': {'10': {'round_trips': 40, 'bytes_sent': 1}}}
+        expect(self.roundtrips.check(results, baseline)).to(have_len(1))
@@ -0,0 +1,54 @@
+# coding=utf-8
+from expects import *
+import os
+import shutil
+import tempfile
+import six
+if six.PY2:
+    from mock import patch, MagicMock
+else:
+    from unittest.mock import patch, MagicMock
+
+from oopgrade.runner import load_migration, run_migration
+
+
+MIGRATION = """
+def migrate(cursor, installed_version):
+    cursor.execute('UPDATE res_partner SET active = true')
+    if cursor.connection.dsn == 'broken':
+        raise ValueError('broken database')
+"""
+
+
+with description('Running a migration on many databases'):
+    with before.each:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.script = os.path.join(self.tmp_dir, 'post-0001_migration.py')
+        with open(self.script, 'w') as f:
+            f.write(MIGRATION)
+
+    with after.each:
+        shutil.rmtree(self.tmp_dir)
+
+    with it('must load migrations from scripts and module paths'):
+        expect(load_migration(self.script).__name__).to(equal('migrate'))
+        expect(load_migration('os.path:join')).to(be(os.path.join))
+        expect(lambda: load_migration('os.path')).to(raise_error(ValueError))
+
+    with it('must report the status of every database'):
+        def connect(dbname, **kwargs):
+            conn = MagicMock()
+            cursor = conn.cursor.return_value.__enter__.return_value
+            cursor.connection.dsn = 'broken' if dbname == 'db2' else dbname
+            return conn
+        with patch('psycopg2.connect', side_effect=connect) as connect_mock:
+            results = list(run_migration(
+                self.script, ['db1', 'db2'], {'user': 'erp'}, processes=1
+            ))
+            expect(connect_mock.call_args_list[0][1]).to(
+                equal({'dbname': 'db1', 'user': 'erp'})
+            )
+        expect([(r['database'], r['status']) for r in results]).to(equal([
+            ('db1', 'ok'), ('db2', 'error')
+        ]))
+        expect(results[1]['error']).to(equal('ValueError: broken database'))
@@ -0,0 +1,40 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import Mock
+else:
+    from unittest.mock import Mock
+
+from oopgrade.oopgrade import MigrationHelper
+from oopgrade.trace import Tracer
+
+
+with description('A Tracer'):
+    with it('must record nested spans of migrations, helpers and SQL'):
+        cursor = Mock()
+        cursor.rowcount = 1
+        with Tracer() as tracer:
+            with tracer.span('migrate module'):
+                MigrationHelper(cursor, 'module').execute_sql('SELECT 1')
+        events = tracer.to_dict()['traceEvents']
+        expect([(e['cat'], e['name']) for e in events]).to(equal([
+            ('migration', 'migrate module'),
+            ('helper', 'MigrationHelper.execute_sql'),
+            ('sql', 'SELECT 1'),
+        ]))
+        migration, helper, sql = events
+        expect(sql['args']).to(have_keys(
+            helper='MigrationHelper.execute_sql', rowcount=1
+        ))
+        expect(helper['ts']).to(be_above_or_equal(migration['ts']))
+        expect(sql['ts'] + sql['dur']).to(
+            be_below_or_equal(helper['ts'] + helper['dur'])
+        )
+        expect(events[0]).to(have_keys(ph='X'))
+
+    with it('must stop recording when stopped'):
+        tracer = Tracer().start()
+        tracer.stop()
+        MigrationHelper(Mock(), 'module').execute_sql('SELECT 1')
+        expect(tracer.events).to(be_empty)
@@ -0,0 +1,254 @@
+# coding=utf-8
+from expects import *
+import six
+if six.PY2:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+import os
+import shutil
+import tempfile
+from oopgrade.utils import (
+    AddonsGraph, ManifestIndex, get_dependencies, collect_requirements,
+    merge_requirements, RequirementsState, pip_install_requirements,
+    MigrationIndex
+)
+from spec.fixtures import get_fixture
+
+
+with description('Getting module dependencies'):
+    with before.each:
+        self.addons_path = get_fixture('addons')
+
+    with it('must return the dependencies in topological order'):
+        deps = get_dependencies('mod_c', self.addons_path)
+        expect(deps).to(equal(['base', 'mod_a', 'mod_b']))
+
+    with it('must return an empty list for modules without dependencies'):
+        expect(get_dependencies('base', self.addons_path)).to(equal([]))
+
+    with it('must parse each manifest only once'):
+        graph = AddonsGraph(self.addons_path)
+        with patch('oopgrade.utils.literal_eval', wraps=eval) as parse:
+            get_dependencies('mod_c', graph=graph)
+            get_dependencies('mod_b', graph=graph)
+            expect(parse.call_count).to(equal(4))
+
+    with it('must raise if the module does not exist'):
+        def callback():
+            get_dependencies('missing', self.addons_path)
+        expect(callback).to(raise_error(Exception))
+
+
+with description('A manifest index'):
+    with before.each:
+        self.addons_path = get_fixture('addons')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmp_dir, 'index.json')
+
+    with after.each:
+        shutil.rmtree(self.tmp_dir)
+
+    with it('must only parse the manifests not in the index'):
+        graph = AddonsGraph(self.addons_path, ManifestIndex(self.index_path))
+        graph.dependencies('mod_c')
+        graph.save()
+        graph = AddonsGraph(self.addons_path, ManifestIndex(self.index_path))
+        with patch('oopgrade.utils.literal_eval', wraps=eval) as parse:
+            expect(graph.dependencies('mod_c')).to(
+                equal(['base', 'mod_a', 'mod_b'])
+            )
+            expect(parse.call_count).to(equal(0))
+
+    with it('must store the requirements file and its hash'):
+        graph = AddonsGraph(self.addons_path, ManifestIndex(self.index_path))
+        info = graph.module_info('mod_a')
+        expect(info['requirements']).to(equal(
+            os.path.join(self.addons_path, 'mod_a', 'requirements.txt')
+        ))
+        expect(info['requirements_hash']).to(have_len(64))
+        expect(graph.requirements('mod_b')).to(be_none)
+
+
+with description('A migration scripts index'):
+    with before.each:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addons_path = os.path.join(self.tmp_dir, 'addons')
+        shutil.copytree(get_fixture('addons'), self.addons_path)
+        self.index_path = os.path.join(self.tmp_dir, 'migrations.json')
+
+    with after.each:
+        shutil.rmtree(self.tmp_dir)
+
+    with it('must order the versions and scripts to run in an upgrade'):
+        index = MigrationIndex(self.addons_path)
+        expect(index.build()).to(equal(['mod_a']))
+        expect(index.versions('mod_a')).to(equal(
+            ['5.0.0.1.0', '5.0.0.2.0', '5.0.0.10.0']
+        ))
+        scripts = index.scripts('mod_a', '5.0.0.1.0', '5.0.0.10.0')
+        expect([(s['stage'], s['version'], s['name']) for s in scripts]).to(
+            equal([
+                ('pre', '5.0.0.10.0', 'pre-0001_columns.py'),
+                ('post', '5.0.0.2.0', 'post-0001_defaults.py'),
+                ('post', '5.0.0.2.0', 'post-0002_clean.py'),
+            ])
+        )
+        expect(scripts[0]['path']).to(equal(os.path.join(
+            self.addons_path, 'mod_a', 'migrations', '5.0.0.10.0',
+            'pre-0001_columns.py'
+        )))
+        expect(index.scripts('mod_a', '5.0.0.1.0', '5.0.0.2.0', stage='pre')).to(
+            equal([])
+        )
+        expect(index.scripts('mod_b')).to(equal([]))
+
+    with it('must only scan the modules with changed migrations'):
+        index = MigrationIndex(self.addons_path, self.index_path)
+        index.build()
+        index.save()
+        index = MigrationIndex(self.addons_path, self.index_path)
+        with patch('oopgrade.utils.os.listdir', wraps=os.listdir) as listdir:
+            expect(index.scripts('mod_a')).to(have_len(5))
+            expect(listdir.call_count).to(equal(0))
+        version_path = os.path.join(
+            self.addons_path, 'mod_a', 'migrations', '5.0.0.2.0'
+        )
+        with open(os.path.join(version_path, 'pre-0001_new.py'), 'w') as f:
+            f.write('')
+        os.utime(version_path, (0, 0))
+        expect(index.scripts('mod_a', '5.0.0.1.0', stage='pre')).to(have_len(2))
+
+
+with description('Aggregating requirements'):
+    with before.each:
+        self.addons_path = get_fixture('addons')
+        self.tmp_dir = tempfile.mkdtemp()
+
+    with after.each:
+        shutil.rmtree(self.tmp_dir)
+
+    with it('must collect the requirements files of the modules closure'):
+        graph = AddonsGraph(self.addons_path)
+        files = collect_requirements(['mod_c', 'mod_b'], graph)
+        expect(files).to(equal([
+            os.path.join(self.addons_path, 'mod_a', 'requirements.txt'),
+            os.path.join(self.addons_path, 'mod_c', 'requirements.txt'),
+        ]))
+
+    with it('must merge repeated requirements'):
+        req_a = os.path.join(self.tmp_dir, 'a.txt')
+        req_b = os.path.join(self.tmp_dir, 'b.txt')
+        with open(req_a, 'w') as f:
+            f.write('six\nredis>=3.0  # comment\n-r other.txt\n'
+                    'futures; python_version<"3"\n')
+        with open(req_b, 'w') as f:
+            f.write('# header\nSix\nredis <4\nlxml[html]\n'
+                    'futures; python_version<"3"\n')
+        expect(merge_requirements([req_a, req_b])).to(equal([
+            'six',
+            'redis>=3.0,<4',
+            '-r {}'.format(os.path.join(self.tmp_dir, 'other.txt')),
+            'futures; python_version<"3"',
+            'lxml[html]',
+        ]))
+
+
+    with it('must make editable and local path requirements absolute'):
+        sub_dir = os.path.join(self.tmp_dir, 'sub')
+        os.mkdir(sub_dir)
+        req = os.path.join(sub_dir, 'requirements.txt')
+        with open(req, 'w') as f:
+            f.write('-e .\n-e ../libs/foo[bar]\n./pkgs/baz.whl; python_version>"3"\n'
+                    '-e git+https://example.com/repo.git#egg=repo\n'
+                    'qux @ https://example.com/qux.zip\n')
+        expect(merge_requirements([req])).to(equal([
+            '-e {}'.format(sub_dir),
+            '-e {}[bar]'.format(os.path.join(self.tmp_dir, 'libs', 'foo')),
+            '{}; python_version>"3"'.format(
+                os.path.join(sub_dir, 'pkgs', 'baz.whl')
+            ),
+            '-e git+https://example.com/repo.git#egg=repo',
+            'qux @ https://example.com/qux.zip',
+        ]))
+
+    with it('must keep hash-pinned requirements with their options'):
+        req_a = os.path.join(self.tmp_dir, 'a.txt')
+        req_b = os.path.join(self.tmp_dir, 'b.txt')
+        with open(req_a, 'w') as f:
+            f.write('foo==1.0 \\\n'
+                    '    --hash=sha256:aaaa \\\n'
+                    '    --hash=sha256:bbbb\n'
+                    '    # via bar\n'
+                    'baz==2.0 --hash=sha256:cccc\n')
+        with open(req_b, 'w') as f:
+            f.write('foo>=0.9\n')
+        expect(merge_requirements([req_a, req_b])).to(equal([
+            'foo==1.0 --hash=sha256:aaaa --hash=sha256:bbbb',
+            'baz==2.0 --hash=sha256:cccc',
+            'foo>=0.9',
+        ]))
+
+    with it('must make the paths of every option spelling absolute'):
+        req = os.path.join(self.tmp_dir, 'requirements.txt')
+        with open(req, 'w') as f:
+            f.write('--requirement=base.txt\n-rother.txt\n'
+                    '--constraint = c.txt\n-cd.txt\n--editable=./lib\n'
+                    '--index-url https://example.com/simple\n')
+        expect(merge_requirements([req])).to(equal([
+            '--requirement {}'.format(os.path.join(self.tmp_dir, 'base.txt')),
+            '-r {}'.format(os.path.join(self.tmp_dir, 'other.txt')),
+            '--constraint {}'.format(os.path.join(self.tmp_dir, 'c.txt')),
+            '-c {}'.format(os.path.join(self.tmp_dir, 'd.txt')),
+            '--editable {}'.format(os.path.join(self.tmp_dir, 'lib')),
+            '--index-url https://example.com/simple',
+        ]))
+
+with description('Installing requirements with a state file'):
+    with before.each:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, 'state.json')
+        self.req = os.path.join(self.tmp_dir, 'requirements.txt')
+        with open(self.req, 'w') as f:
+            f.write('six\n')
+
+    with after.each:
+        shutil.rmtree(self.tmp_dir)
+
+    with it('must skip unchanged requirements files'):
+        with patch('oopgrade.utils.subprocess.check_call') as check_call:
+            state = RequirementsState(self.state_path)
+            pip_install_requirements(self.req, state=state)
+            state.save()
+            state = RequirementsState(self.state_path)
+            pip_install_requirements(self.req, state=state)
+            expect(check_call.call_count).to(equal(1))
+            pip_install_requirements(self.req, state=state, force=True)
+            expect(check_call.call_count).to(equal(2))
+            with open(self.req, 'a') as f:
+                f.write('lxml\n')
+            pip_install_requirements(self.req, state=state)
+            expect(check_call.call_count).to(equal(3))
+
+    with it('must install again if the interpreter changes'):
+        state = RequirementsState(self.state_path)
+        state.mark_installed(self.req)
+        state.save()
+        with patch('oopgrade.utils.interpreter_key', return_value='other'):
+            state = RequirementsState(self.state_path)
+        expect(state.is_installed(self.req)).to(be_false)
+
+    with it('must install again if an included file changes'):
+        nested_dir = os.path.join(self.tmp_dir, 'nested')
+        os.mkdir(nested_dir)
+        with open(self.req, 'w') as f:
+            f.write('six\n--requirement=nested/base.txt\n')
+        with open(os.path.join(nested_dir, 'base.txt'), 'w') as f:
+            f.write('-cconstraints.txt\nredis\n')
+        state = RequirementsState(self.state_path)
+        state.mark_installed(self.req)
+        expect(state.is_installed(self.req)).to(be_true)
+        with open(os.path.join(nested_dir, 'constraints.txt'), 'w') as f:
+            f.write('redis<4\n')
+        expect(state.is_installed(self.req)).to(be_false)
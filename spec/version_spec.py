@@ -59,3 +59,25 @@ with description("a Versions class"):
         expect(sorted_version).to(contain_exactly(
             Version('1.0.3'), Version('2.1.1'), Version('3.2.4')
         ))
+
+    with it('must follow the semantic versioning precedence'):
+        versions = [
+            '1.0.0', '1.0.0-rc.1', '1.0.0-beta.11', '1.0.0-beta.2',
+            '1.0.0-alpha.beta', '1.0.0-alpha.1', '1.0.0-alpha', '0.10.0', '0.9.0'
+        ]
+        expect(sorted(versions, key=Version.sort_key)).to(equal(
+            list(reversed(versions))
+        ))
+        expect(Version('1.0.0-alpha') < '1.0.0').to(be_true)
+        expect(Version('1.0.0+build.1') == Version('1.0.0')).to(be_true)
+        expect(Version('1.0.0') != Version('1.0.1')).to(be_true)
+
+    with it('must be usable in sets and as dict key'):
+        versions = set([Version('1.0.0'), Version('1.0.0'), Version('2.0.0')])
+        expect(versions).to(have_len(2))
+        expect({Version('1.0.0'): 'a'}[Version('1.0.0')]).to(equal('a'))
+
+    with it('must update the comparison key when bumped'):
+        v1 = Version('0.1.1')
+        v1.bump_minor()
+        expect(v1 > '0.1.9').to(be_true)